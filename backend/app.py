@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from fastapi import APIRouter, FastAPI, Request, status, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, Request, status, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -9,9 +9,14 @@ import os
 
 from config import settings
 from routes import auth, users, catalogs, services, proxy
-from database import create_tables, create_admin_user
+from database import async_engine, create_tables, create_admin_user
 from services.discovery import service_discovery
+from services.upstream import upstream_pool
+from services.last_seen import last_seen
 from utils.filesystem import ensure_data_directory_exists
+from utils.rate_limit import rate_limit
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.password import password_hasher
 
 # All the ports from 5000 to 5100
 TARGET_PORTS = list(range(settings.DISCOVERY_PORT_RANGE_START, settings.DISCOVERY_PORT_RANGE_END + 1))
@@ -30,21 +35,40 @@ async def lifespan(app: FastAPI):
     # Start periodic discovery task
     task = asyncio.create_task(periodic_discovery())
     
+    # Start writing last connected times in batches
+    last_seen_task = asyncio.create_task(last_seen.run(settings.LAST_SEEN_FLUSH_INTERVAL))
+    
     yield  # This is where the app runs
     
     # Shutdown actions
-    task.cancel()
+    for background_task in (task, last_seen_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
+    
+    # Write the last connected times that are still pending, without skipping the cleanup below
     try:
-        await task
-    except asyncio.CancelledError:
-        pass
+        last_seen.flush()
+    except Exception as e:
+        print(f"Error flushing last connected times: {e}")
+    
+    # Close the pooled catalog connections
+    await upstream_pool.close()
+    
+    password_hasher.close()
+    
+    # Close the request handlers' database connections
+    await async_engine.dispose()
 
 
 # Periodic discovery function
 async def periodic_discovery():
     while True:
         try:
-            service_discovery.sync_with_database(target_ports=TARGET_PORTS)
+            # Runs on the synchronous engine, off the event loop
+            await asyncio.to_thread(service_discovery.sync_with_database, target_ports=TARGET_PORTS)
         except Exception as e:
             print(f"Error in periodic discovery: {e}")
         # Wait 30 seconds before next discovery
@@ -87,6 +111,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Create an API router with /api prefix
@@ -95,9 +120,9 @@ api_router = APIRouter(prefix="/api")
 # Include all routers under the API router
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["Users"])
-api_router.include_router(catalogs.router, prefix="/catalogs", tags=["Catalogs"])
-api_router.include_router(services.router, prefix="/services", tags=["Services"])
-api_router.include_router(proxy.router, prefix="/proxy", tags=["Proxy"])
+api_router.include_router(catalogs.router, prefix="/catalogs", tags=["Catalogs"], dependencies=[Depends(rate_limit("api"))])
+api_router.include_router(services.router, prefix="/services", tags=["Services"], dependencies=[Depends(rate_limit("api"))])
+api_router.include_router(proxy.router, prefix="/proxy", tags=["Proxy"], dependencies=[Depends(rate_limit("proxy"))])
 
 # Include the API router in the main app
 app.include_router(api_router)
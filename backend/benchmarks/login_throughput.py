@@ -0,0 +1,84 @@
+"""
+Login throughput benchmark.
+
+Fires a burst of concurrent logins at a running BeeHub backend while probing a
+cheap endpoint, to check that bcrypt no longer stalls the event loop: probe
+latency should stay low while the logins are being processed.
+
+Usage:
+    python benchmarks/login_throughput.py --url http://localhost:8081 --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> int:
+    response = await client.post("/api/auth/login", json={"username": username, "password": password})
+    return response.status_code
+
+
+async def run_logins(client: httpx.AsyncClient, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses = {}
+
+    async def one():
+        async with semaphore:
+            status_code = await login(client, args.username, args.password)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+    return {"elapsed": time.perf_counter() - started, "statuses": statuses}
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    """Request an endpoint that does no work, its latency reflects how busy the event loop is"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/openapi.json")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client, \
+            httpx.AsyncClient(base_url=args.url, timeout=120) as probe_client:
+        # Warm up the probed endpoint, the schema is generated on first use
+        await probe_client.get("/openapi.json")
+
+        latencies = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(probe_client, stop, latencies))
+        result = await run_logins(client, args)
+        stop.set()
+        await probe_task
+
+    print(f"{args.logins} logins in {result['elapsed']:.2f}s ({args.logins / result['elapsed']:.1f} logins/s)")
+    print(f"Status codes: {result['statuses']}")
+    if latencies:
+        print(
+            f"Probe latency during the burst ({len(latencies)} calls): "
+            f"p50 {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p99 {percentile(latencies, 99) * 1000:.1f}ms, "
+            f"max {max(latencies) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure login throughput and event loop responsiveness")
+    parser.add_argument("--url", default="http://localhost:8081", help="Backend base URL")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--logins", type=int, default=200, help="Total number of logins")
+    parser.add_argument("--concurrency", type=int, default=50, help="Logins in flight at once")
+    asyncio.run(main(parser.parse_args()))
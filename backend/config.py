@@ -13,13 +13,33 @@ class Settings(BaseSettings):
     
     # Database connection settings
     DATABASE_POOL_SIZE: int = int(os.environ.get("DATABASE_POOL_SIZE", "20"))
+    DATABASE_MAX_OVERFLOW: int = int(os.environ.get("DATABASE_MAX_OVERFLOW", "20"))
+    DATABASE_POOL_TIMEOUT: int = int(os.environ.get("DATABASE_POOL_TIMEOUT", "60"))  # seconds to wait for a connection
     DATABASE_POOL_RECYCLE: int = int(os.environ.get("DATABASE_POOL_RECYCLE", "3600")) # 1 hour
+    # Log every distinct query whose plan scans a whole table (SQLite only, for development)
+    DATABASE_EXPLAIN_QUERIES: bool = os.environ.get("DATABASE_EXPLAIN_QUERIES", "false").lower() == "true"
     
     # JWT settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-jwt-token-generation")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
     
+    # Cache of authenticated users, avoids loading the user on every request
+    AUTH_CACHE_TTL: float = float(os.environ.get("AUTH_CACHE_TTL", "60"))  # 0 disables the cache
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.environ.get("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    
+    # In-memory copy of catalog access, reloaded periodically to see changes made by other workers
+    ACCESS_INDEX_TTL: float = float(os.environ.get("ACCESS_INDEX_TTL", "30"))
+    
+    # bcrypt runs on a dedicated thread pool, extra calls wait in a bounded queue
+    PASSWORD_HASH_WORKERS: int = int(os.environ.get("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", "200"))
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", "15"))  # seconds
+    
+    # Last connected times are kept in memory and written in batches
+    LAST_SEEN_FLUSH_INTERVAL: float = float(os.environ.get("LAST_SEEN_FLUSH_INTERVAL", "30"))  # seconds between writes
+    LAST_SEEN_GRANULARITY: float = float(os.environ.get("LAST_SEEN_GRANULARITY", "60"))  # minimum seconds between two recorded visits
+    
     # Default admin credentials
     ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD: str = os.getenv("ADMIN_PASSWORD", "admin123")
@@ -37,4 +57,50 @@ class Settings(BaseSettings):
     # Param to mimic the bahaviour by just reading the content to get the urls
     DISCOVERY_URLS: str = os.environ.get("DISCOVERY_URLS", "http://localhost:5000")
 
+    # Catalog proxy configuration
+    PROXY_TIMEOUT: float = float(os.environ.get("PROXY_TIMEOUT", "30"))
+    PROXY_MAX_CONNECTIONS: int = int(os.environ.get("PROXY_MAX_CONNECTIONS", "100"))
+    PROXY_MAX_KEEPALIVE_CONNECTIONS: int = int(os.environ.get("PROXY_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    PROXY_KEEPALIVE_EXPIRY: float = float(os.environ.get("PROXY_KEEPALIVE_EXPIRY", "60"))
+    PROXY_MAX_UPLOAD_SIZE: int = int(os.environ.get("PROXY_MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))  # 50 MB
+    PROXY_MAX_BATCH_UPLOAD_SIZE: int = int(os.environ.get("PROXY_MAX_BATCH_UPLOAD_SIZE", str(200 * 1024 * 1024)))  # 200 MB
+    PROXY_STREAM_RESPONSES: bool = os.environ.get("PROXY_STREAM_RESPONSES", "true").lower() == "true"
+    PROXY_CACHE_TTL: float = float(os.environ.get("PROXY_CACHE_TTL", "30"))  # 0 disables the cache
+    PROXY_CACHE_MAX_ENTRIES: int = int(os.environ.get("PROXY_CACHE_MAX_ENTRIES", "256"))
+    PROXY_COALESCE_READS: bool = os.environ.get("PROXY_COALESCE_READS", "true").lower() == "true"  # With the cache also off, theme reads are streamed
+    PROXY_BREAKER_FAILURE_RATE: float = float(os.environ.get("PROXY_BREAKER_FAILURE_RATE", "0.5"))
+    PROXY_BREAKER_MIN_CALLS: int = int(os.environ.get("PROXY_BREAKER_MIN_CALLS", "5"))
+    PROXY_BREAKER_WINDOW: int = int(os.environ.get("PROXY_BREAKER_WINDOW", "20"))
+    PROXY_BREAKER_OPEN_SECONDS: float = float(os.environ.get("PROXY_BREAKER_OPEN_SECONDS", "30"))
+    PROXY_FANOUT_CONCURRENCY: int = int(os.environ.get("PROXY_FANOUT_CONCURRENCY", "8"))
+    PROXY_FANOUT_TIMEOUT: float = float(os.environ.get("PROXY_FANOUT_TIMEOUT", "10"))
+    PROXY_UPLOAD_CONCURRENCY: int = int(os.environ.get("PROXY_UPLOAD_CONCURRENCY", "4"))
+    PROXY_PROBE_CONCURRENCY: int = int(os.environ.get("PROXY_PROBE_CONCURRENCY", "20"))
+    PROXY_PROBE_TIMEOUT: float = float(os.environ.get("PROXY_PROBE_TIMEOUT", "5"))
+    PROXY_PROBE_DEADLINE: float = float(os.environ.get("PROXY_PROBE_DEADLINE", "15"))
+    PROXY_HEDGE_READS: bool = os.environ.get("PROXY_HEDGE_READS", "false").lower() == "true"
+    PROXY_HEDGE_PERCENTILE: float = float(os.environ.get("PROXY_HEDGE_PERCENTILE", "95"))
+    PROXY_HEDGE_MIN_SAMPLES: int = int(os.environ.get("PROXY_HEDGE_MIN_SAMPLES", "20"))
+    PROXY_HEDGE_MIN_DELAY: float = float(os.environ.get("PROXY_HEDGE_MIN_DELAY", "0.05"))
+    PROXY_READ_RETRIES: int = int(os.environ.get("PROXY_READ_RETRIES", "0"))
+    PROXY_RETRY_BACKOFF: float = float(os.environ.get("PROXY_RETRY_BACKOFF", "0.1"))
+    PROXY_MAX_CONCURRENT_READS: int = int(os.environ.get("PROXY_MAX_CONCURRENT_READS", "20"))
+    PROXY_MAX_CONCURRENT_WRITES: int = int(os.environ.get("PROXY_MAX_CONCURRENT_WRITES", "4"))
+    PROXY_QUEUE_SIZE: int = int(os.environ.get("PROXY_QUEUE_SIZE", "50"))
+    PROXY_QUEUE_TIMEOUT: float = float(os.environ.get("PROXY_QUEUE_TIMEOUT", "10"))
+    PROXY_HTTP2: bool = os.environ.get("PROXY_HTTP2", "false").lower() == "true"
+
+    # Per-user rate limits, as "<count>/<second|minute|hour>"
+    RATE_LIMIT_ENABLED: bool = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_PROXY: str = os.environ.get("RATE_LIMIT_PROXY", "300/minute")
+    RATE_LIMIT_API: str = os.environ.get("RATE_LIMIT_API", "300/minute")
+    RATE_LIMIT_DISCOVERY: str = os.environ.get("RATE_LIMIT_DISCOVERY", "6/minute")
+    RATE_LIMIT_IDLE_SECONDS: float = float(os.environ.get("RATE_LIMIT_IDLE_SECONDS", "600"))
+    # "memory://" keeps buckets per worker, a redis:// URL shares them between workers
+    RATE_LIMIT_STORAGE_URL: str = os.environ.get("RATE_LIMIT_STORAGE_URL", "memory://")
+
+    # Page sizes of the users, catalogs and services lists
+    PAGE_SIZE_DEFAULT: int = int(os.environ.get("PAGE_SIZE_DEFAULT", "100"))
+    PAGE_SIZE_MAX: int = int(os.environ.get("PAGE_SIZE_MAX", "500"))
+
 settings = Settings()
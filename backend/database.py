@@ -1,33 +1,112 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Table, JSON
+from sqlalchemy import bindparam, create_engine, event, select, Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Table, JSON
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
+from typing import Any, Dict, Iterable, Set, Tuple
 import os
 
 from config import settings
 from utils.password import get_password_hash
 from utils.filesystem import ensure_data_directory_exists
+from services.query_plans import query_plans
 
 # Ensure data directory exists before creating the database connection
 ensure_data_directory_exists()
 
+# Async driver used by the request handlers for each database backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql"
+}
+
+# DATABASE_URL may name either driver, the request handlers always get the async one
+# and startup and background jobs (migrations, discovery) the default synchronous one
+database_url = make_url(settings.DATABASE_URL)
+backend = database_url.get_backend_name()
+if database_url.get_dialect().is_async:
+    async_database_url = database_url
+    sync_database_url = database_url.set(drivername=backend)
+elif backend in ASYNC_DRIVERS:
+    async_database_url = database_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    sync_database_url = database_url
+else:
+    raise ValueError(f"No async driver known for {backend} databases, name one in DATABASE_URL")
+
+connect_args = {"check_same_thread": False} if backend == "sqlite" else {}
+
 # Ensure database directory exists
-db_path = os.path.dirname(settings.DATABASE_URL.replace('sqlite:///', ''))
+db_path = os.path.dirname(database_url.database or "") if backend == "sqlite" else ""
 if db_path and not os.path.exists(db_path):
     os.makedirs(db_path, exist_ok=True)
 
-# Create database engine with improved connection pooling
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    pool_size=20,           # Increase from default 5
-    max_overflow=20,        # Increase from default 10
-    pool_timeout=60,        # Increase connection timeout
-    pool_recycle=3600,      # Recycle connections after 1 hour
+# Create the request handlers' database engine with improved connection pooling
+async_engine = create_async_engine(
+    async_database_url,
+    connect_args=connect_args,
+    poolclass=AsyncAdaptedQueuePool,  # aiosqlite would otherwise open a connection per checkout
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
     pool_pre_ping=True      # Test connections before using them
 )
+
+# Synchronous engine for startup and background jobs, outside of the event loop
+engine = create_engine(
+    sync_database_url,
+    connect_args=connect_args,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    pool_pre_ping=True
+)
+
+
+class PoolStats:
+    """Counts connection checkouts of the request handlers' engine pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        self.checked_out -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = async_engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+            "checkouts": self.checkouts,
+            "peak_checked_out": self.peak_checked_out
+        }
+
+
+pool_stats = PoolStats()
+event.listen(async_engine.sync_engine, "checkout", pool_stats.on_checkout)
+event.listen(async_engine.sync_engine, "checkin", pool_stats.on_checkin)
+
+# Report queries reading whole tables, meant for development
+if settings.DATABASE_EXPLAIN_QUERIES:
+    query_plans.install(async_engine.sync_engine)
+    query_plans.install(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay usable after commit, reloading them would need another awaited query
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Define association table for many-to-many relationship
@@ -35,7 +114,9 @@ can_access = Table(
     'can_access',
     Base.metadata,
     Column('id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('id_1', Integer, ForeignKey('catalogs.id'), primary_key=True)
+    Column('id_1', Integer, ForeignKey('catalogs.id'), primary_key=True),
+    # The primary key covers user -> catalogs lookups, this one catalog -> users
+    Index('ix_can_access_id_1', 'id_1')
 )
 
 
@@ -63,7 +144,7 @@ class Catalog(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     address = Column(String(50), unique=True, nullable=False)
     private_key = Column(String(50), nullable=False)
-    name = Column(String(50), nullable=False)
+    name = Column(String(50), nullable=False, index=True)
     description = Column(String(255), nullable=True)
     
     # Define relationship to users
@@ -80,29 +161,84 @@ class DiscoveredService(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     service_id = Column(String(64), unique=True, nullable=False)  # Container ID or local service ID
-    name = Column(String(100), nullable=False)
-    service_type = Column(String(20), nullable=False)  # "docker" or "local"
+    name = Column(String(100), nullable=False, index=True)
+    service_type = Column(String(20), nullable=False, index=True)  # "docker" or "local"
     host = Column(String(100), nullable=False, default="localhost")
-    port = Column(Integer, nullable=True)
+    port = Column(Integer, nullable=True, index=True)
     status = Column(String(50), nullable=False)
     additional_ports = Column(JSON, nullable=True)  # Store additional ports
     details = Column(JSON, nullable=True)  # Store service-specific details
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    # Every port of the service (main and additional), indexed for port filtering
+    ports = relationship("ServicePort", cascade="all, delete-orphan")
 
 
-def get_db():
-    """Get database session."""
-    db = SessionLocal()
-    try:
+class ServicePort(Base):
+    __tablename__ = "service_ports"
+    
+    service_id = Column(Integer, ForeignKey("discovered_services.id", ondelete="CASCADE"), primary_key=True)
+    port = Column(Integer, primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_service_ports_port", "port"),
+    )
+
+
+async def update_access(db: AsyncSession, key_column, key_id: int, member_column, member_ids: Iterable[int]) -> Tuple[Set[int], Set[int]]:
+    """
+    Replace the access rows of one user or catalog by only inserting and deleting the differences.
+
+    Args:
+        db: AsyncSession, the caller commits
+        key_column: can_access column of the side being edited (can_access.c.id for a user, can_access.c.id_1 for a catalog)
+        key_id: Id of the edited user or catalog
+        member_column: The other can_access column
+        member_ids: Ids that should have access once done
+
+    Returns:
+        (added ids, removed ids)
+    """
+    member_ids = set(member_ids)
+    current = set((await db.execute(select(member_column).where(key_column == key_id))).scalars())
+    added = member_ids - current
+    removed = current - member_ids
+
+    if removed:
+        # Named binds, the default names derived from "id" collide with the "id_1" column
+        await db.execute(
+            can_access.delete().where(
+                key_column == bindparam("key_id", key_id),
+                member_column.in_(bindparam("member_ids", list(removed), expanding=True))
+            )
+        )
+    if added:
+        await db.execute(
+            can_access.insert(),
+            [{key_column.name: key_id, member_column.name: member_id} for member_id in added]
+        )
+    return added, removed
+
+
+async def get_db():
+    """
+    Get the async database session of the current request.
+
+    FastAPI caches dependencies per request, so every dependency asking for
+    get_db (authentication included) shares this session, closed once the request is done.
+    Queries are awaited, a slow one no longer blocks the other requests.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 def create_tables():
-    """Create all tables in the database."""
+    """Create all tables in the database, then bring existing ones up to date."""
     Base.metadata.create_all(bind=engine)
+    
+    from migrations import run_migrations
+    run_migrations(engine)
 
 
 def create_admin_user():
@@ -0,0 +1,110 @@
+"""
+Versioned schema migrations.
+
+Base.metadata.create_all creates missing tables but never changes existing
+ones, so anything an existing database needs (new indexes, backfills) is added
+here as a new migration. Migrations run at startup, in order, each one in its
+own transaction, and the applied versions are recorded in schema_migrations.
+When the schema is current, startup only reads the latest applied version.
+
+Migrations must be idempotent: a fresh database already gets every table and
+index from create_all before they run.
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, select
+
+logger = logging.getLogger(__name__)
+
+# Kept out of Base.metadata, the models never use it
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+
+def create_indexes(connection, indexes: List[Tuple[str, str, str]]):
+    """Create (name, table, column) indexes that do not exist yet"""
+    tables = MetaData()
+    tables.reflect(bind=connection, only=list({table for _, table, _ in indexes}))
+    for name, table, column in indexes:
+        Index(name, tables.tables[table].c[column]).create(connection, checkfirst=True)
+
+
+def add_hot_query_indexes(connection):
+    create_indexes(connection, [
+        ("ix_can_access_id_1", "can_access", "id_1"),
+        ("ix_discovered_services_service_type", "discovered_services", "service_type"),
+        ("ix_discovered_services_port", "discovered_services", "port"),
+        ("ix_discovered_services_updated_at", "discovered_services", "updated_at"),
+    ])
+
+
+def add_name_sort_indexes(connection):
+    create_indexes(connection, [
+        ("ix_catalogs_name", "catalogs", "name"),
+        ("ix_discovered_services_name", "discovered_services", "name"),
+    ])
+
+
+def backfill_service_ports(connection):
+    """Fill service_ports for the services discovered before the table existed"""
+    from database import DiscoveredService, ServicePort
+
+    indexed = select(ServicePort.service_id)
+    services = connection.execute(
+        select(DiscoveredService.id, DiscoveredService.port, DiscoveredService.additional_ports)
+        .where(DiscoveredService.id.not_in(indexed))
+    ).all()
+
+    rows = []
+    for service_id, port, additional_ports in services:
+        ports = {int(service_port) for service_port in additional_ports or [] if service_port is not None}
+        if port is not None:
+            ports.add(int(port))
+        rows.extend({"service_id": service_id, "port": service_port} for service_port in ports)
+    if rows:
+        connection.execute(ServicePort.__table__.insert(), rows)
+
+
+# (version, description, migration), versions are never reused or reordered
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "Index can_access.id_1 and the discovered_services filter and sort columns", add_hot_query_indexes),
+    (2, "Backfill service_ports from the ports of existing services", backfill_service_ports),
+    (3, "Index the name columns the catalog and service lists sort on", add_name_sort_indexes),
+]
+
+
+def run_migrations(engine) -> int:
+    """
+    Apply the migrations newer than the recorded schema version
+
+    Returns:
+        Number of migrations applied
+    """
+    latest = MIGRATIONS[-1][0]
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        current = connection.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+    if current >= latest:
+        return 0
+
+    applied = 0
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        logger.info(f"Applied migration {version}: {description}")
+        applied += 1
+    return applied
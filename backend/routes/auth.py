@@ -1,13 +1,15 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 
 from database import get_db, User
-from utils.password import verify_password
-from utils.auth import create_access_token, get_current_user
+from utils.password import password_hasher
+from utils.auth import Principal, create_access_token, get_current_user
 from config import settings
+from services.last_seen import last_seen
 
 router = APIRouter()
 
@@ -36,11 +38,15 @@ class LoginRequest(BaseModel):
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Authenticate user with JSON and return JWT token."""
-    user = db.query(User).filter(User.username == login_data.username).first()
-    if not user or not verify_password(login_data.password, user.password):
+    user = (await db.execute(
+        select(User.id, User.username, User.password, User.is_owner).where(User.username == login_data.username)
+    )).first()
+    # Give the connection back to the pool while bcrypt runs
+    await db.rollback()
+    if not user or not await password_hasher.verify(login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -53,8 +59,7 @@ async def login_for_access_token(
     )
     
     # Update last connected time
-    user.last_connected = datetime.now()
-    db.commit()
+    last_seen.touch(user.id)
     
     return {"access_token": access_token, "token_type": "bearer", "username": user.username, "is_owner": user.is_owner}
 
@@ -63,12 +68,12 @@ async def logout():
     # Invalidate the token by removing it from the database or cache
 
 @router.get("/user", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     """Get current user information."""
     return current_user
 
 
 @router.get("/check")
-async def check_authentication(current_user: User = Depends(get_current_user)):
+async def check_authentication(current_user: Principal = Depends(get_current_user)):
     """Check if user is authenticated."""
     return {"authenticated": True, "username": current_user.username}
@@ -1,10 +1,18 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from database import get_db, User, Catalog
-from utils.auth import get_current_user, get_owner_user
+from config import settings
+from database import get_db, update_access, can_access, User, Catalog
+from utils.auth import Principal, get_current_user, get_owner_user
+from services.access_index import access_index
+from utils.pagination import paginate, page_response
+from services.upstream import upstream_pool
+from services.catalog_cache import catalog_cache
+from services.circuit_breaker import catalog_breakers
+from services.bulkhead import catalog_bulkheads
 
 router = APIRouter()
 
@@ -29,6 +37,7 @@ class CatalogResponse(BaseModel):
     name: str
     description: Optional[str] = None
     private_key: Optional[str] = None
+    circuit_state: Optional[str] = None  # Health of the catalog service as seen by the proxy
 
     class Config:
         from_attributes = True  # Updated from orm_mode
@@ -38,15 +47,24 @@ class CatalogAccessUpdate(BaseModel):
     user_ids: List[int]
 
 
+def catalog_response(catalog: Catalog, with_private_key: bool = True) -> CatalogResponse:
+    """Serialize a catalog along with the circuit breaker state of its service."""
+    response = CatalogResponse.model_validate(catalog)
+    response.circuit_state = catalog_breakers.state(catalog.address)
+    if not with_private_key:
+        response.private_key = None
+    return response
+
+
 @router.post("/", response_model=CatalogResponse)
 async def create_catalog(
     catalog_data: CatalogCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can create catalogs
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can create catalogs
 ):
     """Create a new catalog (owner only)."""
     # Check if catalog address already exists
-    existing_catalog = db.query(Catalog).filter(Catalog.address == catalog_data.address).first()
+    existing_catalog = (await db.execute(select(Catalog.id).where(Catalog.address == catalog_data.address))).first()
     if existing_catalog:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -65,81 +83,113 @@ async def create_catalog(
     )
     
     db.add(new_catalog)
-    db.commit()
-    db.refresh(new_catalog)
+    await db.commit()
+    await db.refresh(new_catalog)
+    access_index.put_catalog(new_catalog)
     
-    return new_catalog
+    return catalog_response(new_catalog)
 
 
 @router.get("/", response_model=List[CatalogResponse])
 async def get_catalogs(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    name: Optional[str] = Query(None, description="Only catalogs whose name starts with this prefix"),
+    user_id: Optional[int] = Query(None, description="Only catalogs this user can access (owner only)"),
+    sort: str = Query("id", description="id, name or address"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
-    Get catalogs:
+    Get catalogs, one page at a time:
     - Owner gets all catalogs with private keys
     - Regular users get only catalogs they have access to, without private keys
+
+    The cursor of the next page is returned in the X-Next-Cursor header.
     """
+    columns = [Catalog.id, Catalog.address, Catalog.name, Catalog.description]
     if current_user.is_owner:
-        # Owner gets all catalogs with private keys
-        catalogs = db.query(Catalog).all()
-    else:
+        # Owner gets the private keys, they are never loaded for other users
+        columns.append(Catalog.private_key)
+    query = select(*columns)
+    if not current_user.is_owner:
         # Regular users get only catalogs they have access to
-        catalogs = current_user.catalogs
-        # Remove private keys for non-owners
-        for catalog in catalogs:
-            catalog.private_key = None
+        query = query.where(Catalog.id.in_(await access_index.catalog_ids(current_user.id)))
+    elif user_id is not None:
+        query = query.where(Catalog.id.in_(await access_index.catalog_ids(user_id)))
+    if name:
+        query = query.where(Catalog.name.startswith(name, autoescape=True))
     
-    return catalogs
+    catalogs = await paginate(
+        db,
+        query,
+        {"id": Catalog.id, "name": Catalog.name, "address": Catalog.address},
+        Catalog.id,
+        sort, order, limit, cursor, response
+    )
+    
+    return page_response([
+        {
+            "id": catalog.id,
+            "address": catalog.address,
+            "name": catalog.name,
+            "description": catalog.description,
+            "private_key": catalog.private_key if current_user.is_owner else None,
+            "circuit_state": catalog_breakers.state(catalog.address)
+        }
+        for catalog in catalogs
+    ], response)
 
 
 @router.get("/{catalog_id}", response_model=CatalogResponse)
 async def get_catalog(
     catalog_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Get a catalog by ID."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+    catalog = await db.get(Catalog, catalog_id)
     if not catalog:
         raise HTTPException(status_code=404, detail="Catalog not found")
     
     # Check if user has access to this catalog
-    if not current_user.is_owner and catalog not in current_user.catalogs:
+    if not current_user.is_owner and not await access_index.can_access(current_user.id, catalog.id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this catalog"
         )
     
     # Hide private key for non-owners
-    if not current_user.is_owner:
-        catalog.private_key = None
-    
-    return catalog
+    return catalog_response(catalog, with_private_key=current_user.is_owner)
 
 
 @router.put("/{catalog_id}", response_model=CatalogResponse)
 async def update_catalog(
     catalog_id: int,
     catalog_data: CatalogUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can update catalogs
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can update catalogs
 ):
     """Update a catalog (owner only)."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+    catalog = await db.get(Catalog, catalog_id)
     if not catalog:
         raise HTTPException(status_code=404, detail="Catalog not found")
     
     # Update catalog fields
     if catalog_data.address is not None:
         # Check if address already exists
-        existing_catalog = db.query(Catalog).filter(Catalog.address == catalog_data.address).first()
+        existing_catalog = (await db.execute(select(Catalog.id).where(Catalog.address == catalog_data.address))).first()
         if existing_catalog and existing_catalog.id != catalog_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Catalog with this address already exists"
             )
+        if catalog.address != catalog_data.address:
+            await upstream_pool.discard(catalog.address)
+            catalog_breakers.discard(catalog.address)
+            catalog_bulkheads.discard(catalog.address)
         catalog.address = catalog_data.address
     
     if catalog_data.private_key is not None:
@@ -151,25 +201,35 @@ async def update_catalog(
     if catalog_data.description is not None:
         catalog.description = catalog_data.description
     
-    db.commit()
-    db.refresh(catalog)
+    await db.commit()
+    await db.refresh(catalog)
+    access_index.put_catalog(catalog)
+    
+    # The catalog may now point to another service
+    catalog_cache.invalidate(catalog_id)
     
-    return catalog
+    return catalog_response(catalog)
 
 
 @router.delete("/{catalog_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_catalog(
     catalog_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can delete catalogs
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can delete catalogs
 ):
     """Delete a catalog (owner only)."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+    catalog = await db.get(Catalog, catalog_id)
     if not catalog:
         raise HTTPException(status_code=404, detail="Catalog not found")
     
-    db.delete(catalog)
-    db.commit()
+    await db.delete(catalog)
+    await db.commit()
+    
+    await upstream_pool.discard(catalog.address)
+    catalog_breakers.discard(catalog.address)
+    catalog_bulkheads.discard(catalog.address)
+    catalog_cache.invalidate(catalog_id)
+    access_index.remove_catalog(catalog_id)
     
     return None
 
@@ -178,24 +238,27 @@ async def delete_catalog(
 async def update_catalog_access(
     catalog_id: int,
     access_data: CatalogAccessUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can manage catalog access
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can manage catalog access
 ):
     """Update which users have access to a catalog (owner only)."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+    catalog = (await db.execute(select(Catalog.id, Catalog.name).where(Catalog.id == catalog_id))).first()
     if not catalog:
         raise HTTPException(status_code=404, detail="Catalog not found")
     
-    # Clear existing access
-    catalog.users = []
-    
-    # Add new access
-    for user_id in access_data.user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            catalog.users.append(user)
+    # Reject unknown users with a single query
+    user_ids = set(access_data.user_ids)
+    known_ids = set((await db.execute(select(User.id).where(User.id.in_(user_ids)))).scalars())
+    if known_ids != user_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown user ids: {sorted(user_ids - known_ids)}"
+        )
     
-    db.commit()
+    # Only write the access that changed
+    await update_access(db, can_access.c.id_1, catalog_id, can_access.c.id, user_ids)
+    await db.commit()
+    access_index.set_catalog_users(catalog_id, user_ids)
     
     return {"message": f"Access updated for catalog {catalog.name}"}
 
@@ -203,13 +266,13 @@ async def update_catalog_access(
 @router.get("/{catalog_id}/access", response_model=List[int])
 async def get_catalog_access(
     catalog_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can view catalog access
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can view catalog access
 ):
     """Get list of user IDs with access to a catalog (owner only)."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+    catalog = await db.get(Catalog, catalog_id)
     if not catalog:
         return []
     
-    user_ids = [user.id for user in catalog.users]
+    user_ids = (await db.execute(select(can_access.c.id).where(can_access.c.id_1 == catalog_id))).scalars().all()
     return user_ids
@@ -1,24 +1,42 @@
+import asyncio
+import hashlib
+import json
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, Form
-from fastapi.responses import JSONResponse, Response
-from sqlalchemy.orm import Session
-from typing import Optional
+from email.utils import parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException
+from pydantic import BaseModel
+from typing import Any, List, Optional
 
-from database import get_db, User, Catalog
-from utils.auth import get_current_user
+from config import settings
+from database import pool_stats
+from services.query_plans import query_plans
+from utils.auth import Principal, get_current_user, get_owner_user, principal_cache
+from utils.password import password_hasher
+from services.upstream import upstream_pool
+from services.access_index import CatalogTarget, access_index
+from services.catalog_cache import catalog_cache
+from services.singleflight import catalog_reads
+from services.circuit_breaker import catalog_breakers
+from services.read_policy import read_policy
+from services.bulkhead import BulkheadFull, BulkheadTimeout, catalog_bulkheads
+from services.metrics import UpstreamTrace, status_class, upstream_metrics
 
 router = APIRouter()
 
 
-async def get_catalog_by_id(catalog_id: int, db: Session, current_user: User):
-    """Get catalog and verify user has access."""
-    catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
+async def get_catalog_by_id(catalog_id: int, current_user: Principal) -> CatalogTarget:
+    """Get catalog from the access index and verify user has access."""
+    catalog = await access_index.catalog(catalog_id)
     
     if not catalog:
         raise HTTPException(status_code=404, detail="Catalog not found")
     
     # Check if user has access to this catalog
-    if not current_user.is_owner and catalog not in current_user.catalogs:
+    if not current_user.is_owner and not await access_index.can_access(current_user.id, catalog.id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this catalog"
@@ -27,163 +45,629 @@ async def get_catalog_by_id(catalog_id: int, db: Session, current_user: User):
     return catalog
 
 
+# Upstream response headers relayed to the browser when streaming
+PASSTHROUGH_HEADERS = ("content-type", "content-length", "content-encoding")
+
+# Conditional request headers forwarded to catalogs on reads, and the validators sent back
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+class CatalogThemes(BaseModel):
+    catalog_id: int
+    catalog_name: str
+    status: str  # "ok", "error" or "timeout"
+    status_code: Optional[int] = None
+    themes: Optional[Any] = None
+    error: Optional[str] = None
+
+
+class PuzzleUploadResult(BaseModel):
+    filename: str
+    success: bool
+    status_code: Optional[int] = None
+    detail: Optional[Any] = None
+
+
+class ConnectionTarget(BaseModel):
+    host: str
+    port: int
+    key: str
+
+
+class UpstreamUnavailable(HTTPException):
+    """Raised when a catalog could not be reached (connection error or timeout)"""
+
+
+class UpstreamConnectError(UpstreamUnavailable):
+    """Raised when no connection to a catalog could be opened, the request never reached it"""
+
+
+class UploadTooLarge(Exception):
+    """Raised while streaming an upload that exceeds PROXY_MAX_UPLOAD_SIZE"""
+
+
+async def send_upstream(
+    catalog: CatalogTarget,
+    method: str,
+    path: str,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    content=None,
+    files: Optional[dict] = None,
+    stream: bool = False
+) -> httpx.Response:
+    """
+    Send a request to a catalog, translating transport failures into HTTP errors.
+
+    Calls to a catalog whose circuit breaker is open fail fast with a 503, and calls
+    over the catalog's concurrency limit wait in its bulkhead queue (429 when full).
+    Connection, first byte and total timings are recorded in the upstream metrics,
+    from the moment the bulkhead slot is held; for streamed responses the total is
+    recorded by close_streamed_response.
+    """
+    breaker = catalog_breakers.get(catalog.address)
+    if not breaker.allow_request():
+        raise HTTPException(
+            status_code=503,
+            detail="Catalog service is unavailable, try again later",
+            headers={"Retry-After": str(breaker.retry_after())}
+        )
+    
+    # Bound the concurrent work sent to this catalog, reads and writes separately
+    bulkhead = catalog_bulkheads.get(catalog.address, write=method != "GET")
+    try:
+        await bulkhead.acquire()
+    except BulkheadFull:
+        breaker.release()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many pending requests for this catalog, try again later",
+            headers={"Retry-After": "1"}
+        )
+    except BulkheadTimeout:
+        breaker.release()
+        raise HTTPException(status_code=503, detail="Timed out waiting for the catalog service")
+    except BaseException:
+        breaker.release()
+        raise
+    
+    client = upstream_pool.get_client(catalog.address)
+    upstream_headers = {"Authorization": f"Bearer {catalog.private_key}"}
+    if headers:
+        upstream_headers.update(headers)
+    
+    # Timed from here, the metrics measure the catalog and not the wait for a bulkhead slot
+    trace = UpstreamTrace()
+    try:
+        # Built inside the try, a bad stored address must still give back the half-open probe slot
+        upstream_request = client.build_request(
+            method,
+            f"{catalog.address}{path}",
+            params=params,
+            headers=upstream_headers,
+            content=content,
+            files=files,
+            extensions={"trace": trace}
+        )
+        response = await client.send(upstream_request, stream=stream)
+    except UploadTooLarge:
+        breaker.release()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Upload exceeds the maximum size of {settings.PROXY_MAX_UPLOAD_SIZE} bytes"
+        )
+    except httpx.RequestError as e:
+        breaker.record_failure(timeout=isinstance(e, httpx.TimeoutException))
+        upstream_metrics.observe(
+            catalog.id, path, status_class(None), connect=trace.connect, ttfb=trace.ttfb, total=trace.elapsed()
+        )
+        # Only a failed connect is safe and cheap to retry, a read timeout already waited PROXY_TIMEOUT
+        error = UpstreamConnectError if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)) else UpstreamUnavailable
+        raise error(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+    except BaseException:
+        breaker.release()
+        raise
+    finally:
+        bulkhead.release()
+    
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    
+    upstream_metrics.observe(
+        catalog.id,
+        path,
+        status_class(response.status_code),
+        connect=trace.connect,
+        ttfb=trace.ttfb,
+        total=None if stream else trace.elapsed()
+    )
+    
+    return response
+
+
+async def close_streamed_response(catalog: CatalogTarget, path: str, response: httpx.Response):
+    """Close a streamed upstream response once relayed and record its total time."""
+    await response.aclose()
+    upstream_metrics.observe(
+        catalog.id, path, status_class(response.status_code), total=response.elapsed.total_seconds()
+    )
+
+
+async def proxy_request(
+    catalog: CatalogTarget,
+    method: str,
+    path: str,
+    request: Request,
+    params: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    content=None
+):
+    """
+    Forward a request to a catalog and relay its response.
+
+    With PROXY_STREAM_RESPONSES enabled the upstream body is streamed to the browser
+    as it arrives (still encoded), otherwise it is buffered and returned at once.
+    Anything but a GET invalidates the cached responses of the catalog.
+    """
+    stream = settings.PROXY_STREAM_RESPONSES
+    
+    upstream_headers = dict(headers or {})
+    if stream:
+        # The raw body is relayed, so only ask for encodings the browser understands
+        upstream_headers["Accept-Encoding"] = request.headers.get("accept-encoding", "identity")
+    
+    try:
+        response = await send_upstream(
+            catalog, method, path, params=params, headers=upstream_headers, content=content, stream=stream
+        )
+    finally:
+        if method != "GET":
+            catalog_cache.invalidate(catalog.id)
+    
+    if not stream:
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            media_type=response.headers.get("content-type", "application/json")
+        )
+    
+    response_headers = {
+        name: response.headers[name] for name in PASSTHROUGH_HEADERS + VALIDATOR_HEADERS if name in response.headers
+    }
+    response_headers.setdefault("content-type", "application/json")
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=response_headers,
+        background=BackgroundTask(close_streamed_response, catalog, path, response)
+    )
+
+
+def etag_for(content: bytes) -> str:
+    """Build a strong ETag from the hash of a response body."""
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def is_not_modified(request: Request, validators: dict) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the validators of a response."""
+    if_none_match = request.headers.get("if-none-match")
+    etag = validators.get("etag")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = validators.get("last-modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+async def read_catalog(
+    catalog: CatalogTarget,
+    path: str,
+    params: Optional[dict] = None,
+    conditional: Optional[dict] = None
+) -> dict:
+    """
+    Perform an idempotent catalog read and return its buffered result.
+
+    Results come from the catalog cache when possible, and concurrent identical
+    reads are coalesced into a single upstream call (PROXY_COALESCE_READS).
+    Conditional request headers are forwarded to the catalog, which may answer 304.
+    Every result carries its validators, with an ETag generated from the body
+    when the catalog does not provide one.
+    """
+    key = catalog_cache.make_key(catalog.id, path, params)
+    if catalog_cache.enabled:
+        cached = catalog_cache.get(key)
+        if cached is not None:
+            return {
+                "content": cached["content"],
+                "status_code": cached["status_code"],
+                "media_type": cached["media_type"],
+                "headers": cached["headers"]
+            }
+    
+    async def fetch():
+        generation = catalog_cache.generation(catalog.id)
+        # Reads are idempotent, so they may be hedged and retried (PROXY_HEDGE_READS, PROXY_READ_RETRIES)
+        response = await read_policy.run(
+            (catalog.id, path),
+            lambda: send_upstream(catalog, "GET", path, params=params, headers=conditional),
+            retry_on=(UpstreamConnectError,),
+            is_success=lambda response: response.status_code < 500
+        )
+        validators = {
+            name: response.headers[name] for name in VALIDATOR_HEADERS if name in response.headers
+        }
+        if response.status_code == 200 and "etag" not in validators:
+            validators["etag"] = etag_for(response.content)
+        # Theme data sits behind authentication, so only the browser may keep it
+        validators.setdefault("cache-control", "private, no-cache")
+        
+        result = {
+            "content": response.content,
+            "status_code": response.status_code,
+            "media_type": response.headers.get("content-type", "application/json"),
+            "headers": validators
+        }
+        if catalog_cache.enabled and response.status_code == 200:
+            catalog_cache.set(key, generation=generation, **result)
+        return result
+    
+    if settings.PROXY_COALESCE_READS:
+        # Reads with different validators may get different answers from the catalog
+        flight_key = key + tuple(sorted((conditional or {}).items()))
+        return await catalog_reads.do(flight_key, fetch)
+    return await fetch()
+
+
+async def proxy_read(catalog: CatalogTarget, path: str, request: Request, params: Optional[dict] = None):
+    """
+    Serve an idempotent catalog read (see read_catalog), answering 304 when the browser copy is current.
+
+    With the cache and coalescing both off nothing shares the body, so when PROXY_STREAM_RESPONSES
+    is on the read is streamed like any other proxied call instead: large theme listings are not
+    buffered, but they get no generated ETag, hedging or retries.
+    """
+    conditional = {
+        name: request.headers[name] for name in CONDITIONAL_HEADERS if name in request.headers
+    }
+    if settings.PROXY_STREAM_RESPONSES and not catalog_cache.enabled and not settings.PROXY_COALESCE_READS:
+        return await proxy_request(catalog, "GET", path, request, params=params, headers=conditional)
+    
+    result = await read_catalog(catalog, path, params, conditional)
+    
+    if result["status_code"] == 304 or (result["status_code"] == 200 and is_not_modified(request, result["headers"])):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=result["headers"])
+    
+    return Response(
+        content=result["content"],
+        status_code=result["status_code"],
+        media_type=result["media_type"],
+        headers=result["headers"]
+    )
+
+
+# Uploads are streamed straight from the request body, so document the multipart form manually
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+
+BATCH_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                    "required": ["files"]
+                }
+            }
+        }
+    }
+}
+
+
+def check_content_length(request: Request, max_size: int, detail: str):
+    """Reject a request whose declared body size exceeds max_size bytes before reading it."""
+    content_length = request.headers.get("content-length")
+    if content_length is None:
+        return
+    if not content_length.isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Content-Length header")
+    if int(content_length) > max_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+async def read_upload_files(request: Request, field: str, max_size: int) -> List[UploadFile]:
+    """
+    Parse the files of a multipart upload, aborting once the body exceeds max_size bytes.
+
+    Starlette spools every parsed file to disk, so the size is checked on the
+    Content-Length header and again on each chunk received while parsing.
+    The caller closes the returned files.
+    """
+    detail = f"Batch upload exceeds the maximum size of {max_size} bytes"
+    check_content_length(request, max_size, detail)
+    
+    received = 0
+    
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        received += len(message.get("body", b""))
+        if received > max_size:
+            raise UploadTooLarge()
+        return message
+    
+    try:
+        form = await Request(request.scope, receive).form()
+    except UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid multipart upload: {e}")
+    
+    files = [value for value in form.getlist(field) if isinstance(value, UploadFile)]
+    if not files:
+        await form.close()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Expected at least one file in the '{field}' field")
+    return files
+
+
+async def stream_request_body(request: Request, max_size: int):
+    """Yield the incoming request body chunk by chunk, aborting once it exceeds max_size bytes."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_size:
+            raise UploadTooLarge()
+        yield chunk
+
+
+async def forward_upload(catalog: CatalogTarget, path: str, params: dict, request: Request):
+    """
+    Forward a multipart puzzle upload to a catalog without buffering it.
+
+    The browser's multipart body is passed through unchanged (including its boundary),
+    so memory usage stays constant whatever the size of the archive.
+    """
+    max_size = settings.PROXY_MAX_UPLOAD_SIZE
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a multipart/form-data upload"
+        )
+    
+    headers = {"Content-Type": content_type}
+    check_content_length(request, max_size, f"Upload exceeds the maximum size of {max_size} bytes")
+    if "content-length" in request.headers:
+        headers["Content-Length"] = request.headers["content-length"]
+    
+    return await proxy_request(
+        catalog,
+        "POST",
+        path,
+        request,
+        params=params,
+        headers=headers,
+        content=stream_request_body(request, max_size)
+    )
+
+
 @router.get("/catalog/{catalog_id}/themes")
 async def proxy_get_themes(
     catalog_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to get themes from a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
+    
+    return await proxy_read(catalog, "/themes", request)
+
+
+@router.get("/themes", response_model=List[CatalogThemes])
+async def proxy_get_all_themes(
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Get the themes of every catalog the user can access.
+
+    Catalogs are queried concurrently (at most PROXY_FANOUT_CONCURRENCY at a time),
+    each one within PROXY_FANOUT_TIMEOUT seconds. A failing catalog only
+    reports its own error instead of failing the whole response.
+    """
+    catalogs = await access_index.all_catalogs()
+    if not current_user.is_owner:
+        catalog_ids = await access_index.catalog_ids(current_user.id)
+        catalogs = [catalog for catalog in catalogs if catalog.id in catalog_ids]
+    
+    semaphore = asyncio.Semaphore(settings.PROXY_FANOUT_CONCURRENCY)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async def fetch_themes(catalog: CatalogTarget) -> CatalogThemes:
+        result = CatalogThemes(catalog_id=catalog.id, catalog_name=catalog.name, status="ok")
         try:
-            response = await client.get(
-                f"{catalog.address}/themes",
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+            async with semaphore:
+                response = await asyncio.wait_for(
+                    read_catalog(catalog, "/themes"),
+                    timeout=settings.PROXY_FANOUT_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            result.status = "timeout"
+            result.error = f"Catalog did not answer within {settings.PROXY_FANOUT_TIMEOUT} seconds"
+            return result
+        except HTTPException as e:
+            result.status = "error"
+            result.status_code = e.status_code
+            result.error = e.detail
+            return result
+        
+        result.status_code = response["status_code"]
+        if response["status_code"] != 200:
+            result.status = "error"
+            result.error = response["content"].decode(errors="replace")
+            return result
+        
+        try:
+            result.themes = json.loads(response["content"])
+        except ValueError:
+            result.status = "error"
+            result.error = "Catalog returned an invalid JSON response"
+        return result
+    
+    return await asyncio.gather(*(fetch_themes(catalog) for catalog in catalogs))
 
 
 @router.post("/catalog/{catalog_id}/theme/reload")
 async def proxy_reload_themes(
     catalog_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to reload themes in a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                f"{catalog.address}/theme/reload",
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+    return await proxy_request(catalog, "POST", "/theme/reload", request)
 
 
 @router.delete("/catalog/{catalog_id}/theme")
 async def proxy_delete_theme(
     catalog_id: int,
     name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to delete a theme from a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.delete(
-                f"{catalog.address}/theme",
-                params={"name": name},
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+    return await proxy_request(catalog, "DELETE", "/theme", request, params={"name": name})
 
 
 @router.post("/catalog/{catalog_id}/theme")
 async def proxy_create_theme(
     catalog_id: int,
     name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to create a new theme in a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                f"{catalog.address}/theme",
-                params={"name": name},
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+    return await proxy_request(catalog, "POST", "/theme", request, params={"name": name})
 
 
 @router.get("/catalog/{catalog_id}/theme")
 async def proxy_get_theme(
     catalog_id: int,
     name: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to get a theme from a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                f"{catalog.address}/theme",
-                params={"name": name},
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
-
-
-@router.post("/catalog/{catalog_id}/puzzle/upload")
+    return await proxy_read(catalog, "/theme", request, params={"name": name})
+
+
+@router.post("/catalog/{catalog_id}/puzzle/upload", openapi_extra=UPLOAD_REQUEST_BODY)
 async def proxy_upload_puzzle(
     catalog_id: int,
     theme: str,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to upload a puzzle to a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    return await forward_upload(catalog, "/puzzle/upload", {"theme": theme}, request)
+
+
+@router.post(
+    "/catalog/{catalog_id}/puzzle/upload/batch",
+    response_model=List[PuzzleUploadResult],
+    openapi_extra=BATCH_UPLOAD_REQUEST_BODY
+)
+async def proxy_upload_puzzles(
+    catalog_id: int,
+    theme: str,
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Proxy endpoint to upload several puzzles to a theme of a catalog.
+
+    Files are forwarded in parallel (at most PROXY_UPLOAD_CONCURRENCY at a time)
+    and the response reports the outcome of each file. The whole request is limited
+    to PROXY_MAX_BATCH_UPLOAD_SIZE bytes and each file to PROXY_MAX_UPLOAD_SIZE.
+    """
+    catalog = await get_catalog_by_id(catalog_id, current_user)
+    files = await read_upload_files(request, "files", settings.PROXY_MAX_BATCH_UPLOAD_SIZE)
+    max_size = settings.PROXY_MAX_UPLOAD_SIZE
+    semaphore = asyncio.Semaphore(settings.PROXY_UPLOAD_CONCURRENCY)
+    
+    async def upload(file: UploadFile) -> PuzzleUploadResult:
+        result = PuzzleUploadResult(filename=file.filename or "", success=False)
+        if file.size is not None and file.size > max_size:
+            result.status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            result.detail = f"Upload exceeds the maximum size of {max_size} bytes"
+            return result
+        
         try:
-            content = await file.read()
-            
-            files = {"file": (file.filename, content, file.content_type)}
-            
-            response = await client.post(
-                f"{catalog.address}/puzzle/upload",
-                params={"theme": theme},
-                headers={"Authorization": f"Bearer {catalog.private_key}"},
-                files=files
-            )
-            
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+            async with semaphore:
+                # The spooled file is handed over as is so httpx streams it in chunks
+                response = await send_upstream(
+                    catalog,
+                    "POST",
+                    "/puzzle/upload",
+                    params={"theme": theme},
+                    files={"file": (file.filename, file.file, file.content_type)}
+                )
+        except HTTPException as e:
+            result.status_code = e.status_code
+            result.detail = e.detail
+            return result
+        
+        result.status_code = response.status_code
+        result.success = response.is_success
+        try:
+            result.detail = response.json()
+        except ValueError:
+            result.detail = response.text
+        return result
+    
+    try:
+        return await asyncio.gather(*(upload(file) for file in files))
+    finally:
+        catalog_cache.invalidate(catalog.id)
+        for file in files:
+            await file.close()
 
 
 @router.delete("/catalog/{catalog_id}/puzzle")
@@ -191,62 +675,93 @@ async def proxy_delete_puzzle(
     catalog_id: int,
     theme: str,
     puzzle: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to delete a puzzle from a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.delete(
-                f"{catalog.address}/puzzle",
-                params={"theme": theme, "puzzle": puzzle},
-                headers={"Authorization": f"Bearer {catalog.private_key}"}
-            )
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
-
-
-@router.post("/catalog/{catalog_id}/puzzle/hotswap")
+    return await proxy_request(catalog, "DELETE", "/puzzle", request, params={"theme": theme, "puzzle": puzzle})
+
+
+@router.post("/catalog/{catalog_id}/puzzle/hotswap", openapi_extra=UPLOAD_REQUEST_BODY)
 async def proxy_hotswap_puzzle(
     catalog_id: int,
     theme: str,
     puzzle_id: str,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Principal = Depends(get_current_user)
 ):
     """Proxy endpoint to hot swap a puzzle in a catalog."""
-    catalog = await get_catalog_by_id(catalog_id, db, current_user)
+    catalog = await get_catalog_by_id(catalog_id, current_user)
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            content = await file.read()
-            
-            files = {"file": (file.filename, content, file.content_type)}
-            
-            print(f"Uploading file: {file.filename}, content type: {file.content_type}")
-            print(f"Catalog address: {catalog.address}")
-            response = await client.post(
-                f"{catalog.address}/puzzle/hotswap",
-                params={"theme": theme, "puzzle_id": puzzle_id},
-                headers={"Authorization": f"Bearer {catalog.private_key}"},
-                files=files
-            )
-            
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                media_type=response.headers.get("content-type", "application/json")
-            )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Error communicating with catalog service: {str(e)}")
+    return await forward_upload(catalog, "/puzzle/hotswap", {"theme": theme, "puzzle_id": puzzle_id}, request)
+
+
+@router.get("/stats")
+async def get_proxy_stats(
+    current_user: Principal = Depends(get_owner_user)  # Only owners can inspect the proxy
+):
+    """Get cache, request coalescing, circuit breaker, hedging, bulkhead, auth cache, access index, password hashing, database pool and query plan counters (owner only)."""
+    return {
+        "cache": catalog_cache.stats(),
+        "coalescing": catalog_reads.stats(),
+        "circuit_breakers": catalog_breakers.stats(),
+        "read_policy": read_policy.stats(),
+        "bulkheads": catalog_bulkheads.stats(),
+        "principals": principal_cache.stats(),
+        "access_index": access_index.stats(),
+        "password_hashing": password_hasher.stats(),
+        "database_pool": pool_stats.snapshot(),
+        "query_plans": query_plans.stats()
+    }
+
+
+@router.get("/metrics")
+async def get_proxy_metrics(
+    format: str = "json",
+    current_user: Principal = Depends(get_owner_user)  # Only owners can inspect upstream metrics
+):
+    """
+    Get upstream latency histograms per catalog, path and status class (owner only).
+
+    Use format=prometheus to get the Prometheus text exposition format.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(upstream_metrics.render_prometheus())
+    if format != "json":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid format. Must be 'json' or 'prometheus'."
+        )
+    return upstream_metrics.snapshot()
+
+
+async def probe_service(host: str, port: int, key: str) -> dict:
+    """Check that a catalog service answers its /apikey endpoint with the provided key."""
+    address = f"http://{host}:{port}"
+    key = key.replace(" ", "+")
+    
+    client = upstream_pool.get_client()
+    
+    try:
+        response = await client.get(
+            f"{address}/apikey",
+            headers={"Authorization": f"Bearer {key}"},
+            timeout=settings.PROXY_PROBE_TIMEOUT  # Short timeout for quick feedback
+        )
+        
+        return {
+            "success": response.status_code == 200,
+            "status_code": response.status_code,
+            "message": "Connection successful" if response.status_code == 200 else "Connection failed"
+        }
+    except httpx.RequestError as e:
+        return {
+            "success": False,
+            "status_code": None,
+            "message": f"Error connecting to service: {str(e)}"
+        }
 
 
 @router.get("/test-connection")
@@ -254,8 +769,7 @@ async def test_connection(
     host: str,
     port: int,
     key: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Test connection to a catalog service with the provided key."""
     # Only owners can test connections
@@ -265,25 +779,56 @@ async def test_connection(
             detail="Only owners can test service connections"
         )
     
-    address = f"http://{host}:{port}"
-    key = key.replace(" ", "+")
+    return await probe_service(host, port, key)
+
+
+@router.post("/test-connections")
+async def test_connections(
+    targets: List[ConnectionTarget],
+    current_user: Principal = Depends(get_owner_user)  # Only owners can test connections
+):
+    """
+    Test connections to several catalog services at once (owner only).
+
+    Services are probed concurrently (at most PROXY_PROBE_CONCURRENCY at a time) and
+    results are streamed back as newline-delimited JSON as soon as each probe finishes.
+    Probes still running after PROXY_PROBE_DEADLINE seconds are reported as timed out.
+    """
+    semaphore = asyncio.Semaphore(settings.PROXY_PROBE_CONCURRENCY)
+    
+    async def probe(index: int, target: ConnectionTarget):
+        async with semaphore:
+            result = await probe_service(target.host, target.port, target.key)
+        return index, result
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    def report(target: ConnectionTarget, result: dict) -> str:
+        return json.dumps({"host": target.host, "port": target.port, **result}) + "\n"
+    
+    async def results():
+        tasks = [asyncio.ensure_future(probe(index, target)) for index, target in enumerate(targets)]
+        reported = set()
         try:
-            response = await client.get(
-                f"{address}/apikey",
-                headers={"Authorization": f"Bearer {key}"},
-                timeout=5.0  # Short timeout for quick feedback
-            )
+            for next_done in asyncio.as_completed(tasks, timeout=settings.PROXY_PROBE_DEADLINE):
+                try:
+                    index, result = await next_done
+                except asyncio.TimeoutError:
+                    break
+                reported.add(index)
+                yield report(targets[index], result)
             
-            return {
-                "success": response.status_code == 200,
-                "status_code": response.status_code,
-                "message": "Connection successful" if response.status_code == 200 else "Connection failed"
-            }
-        except httpx.RequestError as e:
-            return {
-                "success": False,
-                "status_code": None,
-                "message": f"Error connecting to service: {str(e)}"
-            }
+            for index, task in enumerate(tasks):
+                if index in reported:
+                    continue
+                if task.done() and not task.cancelled():
+                    yield report(targets[index], task.result()[1])
+                else:
+                    yield report(targets[index], {
+                        "success": False,
+                        "status_code": None,
+                        "message": f"No answer within {settings.PROXY_PROBE_DEADLINE} seconds"
+                    })
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
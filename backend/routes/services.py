@@ -1,12 +1,16 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Any
 from pydantic import BaseModel
 
-from database import get_db, DiscoveredService
+from config import settings
+from database import get_db, DiscoveredService, ServicePort
 from utils.auth import get_current_user, get_owner_user
+from utils.rate_limit import rate_limit, rate_limiter
 from services.discovery import service_discovery
+from utils.pagination import paginate, page_response
 
 router = APIRouter()
 
@@ -41,13 +45,23 @@ def run_discovery(target_ports: Optional[List[int]] = None):
 @router.get("/", response_model=List[ServiceResponse])
 async def get_services(
     background_tasks: BackgroundTasks,
+    response: Response,
     refresh: bool = False,
     ports: Optional[str] = None,
     type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    name: Optional[str] = Query(None, description="Only services whose name starts with this prefix"),
+    sort: str = Query("id", description="id, name, service_type or updated_at"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db),
     current_user: Any = Depends(get_current_user)
 ):
-    """Get all discovered services with optional filtering"""
+    """
+    Get discovered services with optional filtering, one page at a time.
+
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
     target_ports = None
     if ports:
         try:
@@ -60,10 +74,20 @@ async def get_services(
     
     # Run discovery in background if refresh is requested
     if refresh:
+        await rate_limiter.check(current_user.id, "discovery")
         background_tasks.add_task(run_discovery, target_ports)
     
-    # Build the query with filters
-    query = db.query(DiscoveredService)
+    # Build the query with filters, leaving out the details JSON only the detail endpoint returns
+    query = select(
+        DiscoveredService.id,
+        DiscoveredService.name,
+        DiscoveredService.service_type,
+        DiscoveredService.host,
+        DiscoveredService.port,
+        DiscoveredService.status,
+        DiscoveredService.additional_ports,
+        DiscoveredService.updated_at
+    )
     
     # Filter by service type if specified
     if type:
@@ -72,38 +96,51 @@ async def get_services(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid service type. Must be 'docker' or 'local'."
             )
-        query = query.filter(DiscoveredService.service_type == type)
+        query = query.where(DiscoveredService.service_type == type)
     
-    # Get all services first
-    services = query.all()
+    if name:
+        query = query.where(DiscoveredService.name.startswith(name, autoescape=True))
     
-    # Filter by port if specified (needs to be done manually due to JSON field)
+    # Filter by main or additional port through the indexed port table
     if target_ports:
-        filtered_services = []
-        for service in services:
-            # Check if main port is in target_ports
-            if service.port in target_ports:
-                filtered_services.append(service)
-                continue
-                
-            # Check if any additional port is in target_ports
-            if service.additional_ports:
-                if any(port in target_ports for port in service.additional_ports):
-                    filtered_services.append(service)
-        
-        return filtered_services
+        query = query.where(DiscoveredService.id.in_(
+            select(ServicePort.service_id).where(ServicePort.port.in_(target_ports))
+        ))
     
-    return services
+    services = await paginate(
+        db,
+        query,
+        {
+            "id": DiscoveredService.id,
+            "name": DiscoveredService.name,
+            "service_type": DiscoveredService.service_type,
+            "updated_at": DiscoveredService.updated_at
+        },
+        DiscoveredService.id,
+        sort, order, limit, cursor, response
+    )
+    return page_response([
+        {
+            "id": service.id,
+            "name": service.name,
+            "service_type": service.service_type,
+            "host": service.host,
+            "port": service.port,
+            "status": service.status,
+            "additional_ports": service.additional_ports
+        }
+        for service in services
+    ], response)
 
 
 @router.get("/{service_id}", response_model=ServiceDetail)
 async def get_service(
     service_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: Any = Depends(get_current_user)
 ):
     """Get a specific service by ID"""
-    service = db.query(DiscoveredService).filter(DiscoveredService.id == service_id).first()
+    service = await db.get(DiscoveredService, service_id)
     if not service:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -113,7 +150,7 @@ async def get_service(
     return service
 
 
-@router.post("/discover", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/discover", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit("discovery"))])
 async def trigger_discovery(
     background_tasks: BackgroundTasks,
     ports: Optional[str] = None,
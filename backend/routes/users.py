@@ -1,15 +1,25 @@
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 
-from database import get_db, User, Catalog
-from utils.password import get_password_hash, verify_password
-from utils.auth import get_current_user, get_owner_user
+from config import settings
+from database import get_db, update_access, can_access, User, Catalog
+from utils.password import password_hasher
+from utils.auth import Principal, get_current_user, get_owner_user, principal_cache
+from services.last_seen import last_seen
+from services.access_index import access_index
+from utils.pagination import paginate, page_response
+from utils.rate_limit import rate_limit
 
 router = APIRouter()
 
+# Applied per route: is-owner is public and the limiter counts calls per authenticated user
+API_RATE_LIMIT = [Depends(rate_limit("api"))]
+
 
 class UserCreate(BaseModel):
     username: str
@@ -40,23 +50,25 @@ class UserResponse(BaseModel):
 class CatalogAccessUpdate(BaseModel):
     catalog_ids: List[int]
 
-@router.post("/", response_model=UserResponse)
+@router.post("/", response_model=UserResponse, dependencies=API_RATE_LIMIT)
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can create users
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can create users
 ):
     """Create a new user (owner only)."""
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = (await db.execute(select(User.id).where(User.username == user_data.username))).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
+    # Give the connection back to the pool while bcrypt runs
+    await db.rollback()
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     new_user = User(
         username=user_data.username,
         password=hashed_password,
@@ -64,49 +76,93 @@ async def create_user(
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The same username was created by a concurrent request while bcrypt ran
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
+    await db.refresh(new_user)
     
     return new_user
 
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=List[UserResponse], dependencies=API_RATE_LIMIT)
 async def get_all_users(
-    db: Session = Depends(get_db),
+    response: Response,
+    username: Optional[str] = Query(None, description="Only users whose username starts with this prefix"),
+    is_owner: Optional[bool] = None,
+    catalog_id: Optional[int] = Query(None, description="Only users with access to this catalog"),
+    sort: str = Query("id", description="id or username"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can list users
 ):
-    """Get all users (owner only)."""
-    users = db.query(User).all()
-    return users
+    """
+    Get users (owner only), one page at a time.
+
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    # Only the columns of UserResponse, never the password hash
+    query = select(User.id, User.username, User.is_owner, User.last_connected)
+    if username:
+        query = query.where(User.username.startswith(username, autoescape=True))
+    if is_owner is not None:
+        query = query.where(User.is_owner == is_owner)
+    if catalog_id is not None:
+        query = query.where(User.id.in_(select(can_access.c.id).where(can_access.c.id_1 == catalog_id)))
+    
+    users = await paginate(
+        db,
+        query,
+        {"id": User.id, "username": User.username},
+        User.id,
+        sort, order, limit, cursor, response
+    )
+    return page_response([
+        {
+            "id": user.id,
+            "username": user.username,
+            "is_owner": user.is_owner,
+            "last_connected": user.last_connected.isoformat() if user.last_connected else None
+        }
+        for user in users
+    ], response)
 
-@router.get("/{user_id}", response_model=UserResponse)
+@router.get("/{user_id}", response_model=UserResponse, dependencies=API_RATE_LIMIT)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can see user details
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can see user details
 ):
     """Get user by ID (owner only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-@router.put("/{user_id}", response_model=UserResponse)
+@router.put("/{user_id}", response_model=UserResponse, dependencies=API_RATE_LIMIT)
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can update users
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can update users
 ):
     """Update user (owner only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update user fields
     if user_data.username is not None:
         # Check if username already exists
-        existing_user = db.query(User).filter(User.username == user_data.username).first()
+        existing_user = (await db.execute(select(User.id).where(User.username == user_data.username))).first()
         if existing_user and existing_user.id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -117,17 +173,18 @@ async def update_user(
     if user_data.is_owner is not None:
         user.is_owner = user_data.is_owner
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    principal_cache.invalidate(user_id)
     
     return user
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=API_RATE_LIMIT)
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user) 
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user) 
 ):
     """Delete user (owner only)."""
     # Prevent owner from deleting themselves
@@ -137,84 +194,95 @@ async def delete_user(
             detail="Cannot delete your own account through this endpoint"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    principal_cache.invalidate(user_id)
+    access_index.remove_user(user_id)
+    last_seen.forget(user_id)
     
     return None
 
 
-@router.post("/change-password", status_code=status.HTTP_200_OK)
+@router.post("/change-password", status_code=status.HTTP_200_OK, dependencies=API_RATE_LIMIT)
 async def change_password(
     password_data: PasswordUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """Change user password (any authenticated user for their own account)."""
+    current_hash = (await db.execute(select(User.password).where(User.id == current_user.id))).scalar_one()
+    # Give the connection back to the pool while bcrypt runs
+    await db.rollback()
+    
     # Check if current password is correct
-    if not verify_password(password_data.current_password, current_user.password):
+    if not await password_hasher.verify(password_data.current_password, current_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    current_user.password = get_password_hash(password_data.new_password)
-    db.commit()
+    new_hash = await password_hasher.hash(password_data.new_password)
+    await db.execute(update(User).where(User.id == current_user.id).values(password=new_hash))
+    await db.commit()
     
     return {"message": "Password updated successfully"}
 
 @router.get("/{username}/is-owner", response_model=bool)
 async def is_owner(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Check if a user is an owner."""
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
+    owner = (await db.execute(select(User.is_owner).where(User.username == username))).scalar_one_or_none()
+    if owner is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return user.is_owner
+    return owner
 
-@router.get("/{user_id}/catalogs", response_model=List[int])
+@router.get("/{user_id}/catalogs", response_model=List[int], dependencies=API_RATE_LIMIT)
 async def get_user_catalogs(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can view user catalogs
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can view user catalogs
 ):
     """Get list of catalog IDs a user has access to (owner only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    catalog_ids = [catalog.id for catalog in user.catalogs]
+    catalog_ids = (await db.execute(select(can_access.c.id_1).where(can_access.c.id == user_id))).scalars().all()
     return catalog_ids
 
 
-@router.put("/{user_id}/catalogs", status_code=status.HTTP_200_OK)
+@router.put("/{user_id}/catalogs", status_code=status.HTTP_200_OK, dependencies=API_RATE_LIMIT)
 async def update_user_catalogs(
     user_id: int,
     access_data: CatalogAccessUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_owner_user)  # Only owners can update user catalogs
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_owner_user)  # Only owners can update user catalogs
 ):
     """Update which catalogs a user has access to (owner only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = (await db.execute(select(User.id, User.username).where(User.id == user_id))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Clear existing access
-    user.catalogs = []
-    
-    # Add new access
-    for catalog_id in access_data.catalog_ids:
-        catalog = db.query(Catalog).filter(Catalog.id == catalog_id).first()
-        if catalog:
-            user.catalogs.append(catalog)
+    # Reject unknown catalogs with a single query
+    catalog_ids = set(access_data.catalog_ids)
+    known_ids = set((await db.execute(select(Catalog.id).where(Catalog.id.in_(catalog_ids)))).scalars())
+    if known_ids != catalog_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown catalog ids: {sorted(catalog_ids - known_ids)}"
+        )
     
-    db.commit()
+    # Only write the access that changed
+    await update_access(db, can_access.c.id, user_id, can_access.c.id_1, catalog_ids)
+    await db.commit()
+    access_index.set_user_catalogs(user_id, catalog_ids)
     
     return {"message": f"Catalog access updated for user {user.username}"}
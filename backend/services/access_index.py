@@ -0,0 +1,155 @@
+from config import settings
+import asyncio
+import logging
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, Catalog, can_access
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogTarget(BaseModel):
+    """Catalog columns needed to proxy a call"""
+    id: int
+    name: str
+    address: str
+    private_key: str
+
+    class Config:
+        from_attributes = True
+
+
+class AccessIndex:
+    """
+    In-memory copy of the can_access table and of the catalogs, so access checks
+    and proxied calls need no query.
+
+    Routes writing access or catalogs update the index right after committing.
+    The whole index is reloaded every ACCESS_INDEX_TTL seconds to pick up changes
+    made by other workers.
+    """
+
+    # Reads of a reload that raced with a write are retried this many times
+    LOAD_ATTEMPTS = 3
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.user_catalogs: Dict[int, FrozenSet[int]] = {}
+        self.catalogs: Dict[int, CatalogTarget] = {}
+        self.loaded_at: Optional[float] = None
+        self.reloads = 0
+        self.writes = 0  # Bumped by every writer, a reload overlapping one is outdated
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        """
+        Load the whole index from the database
+
+        A write committed while the tables are read may be missing from the
+        snapshot, so the reads are done again until no write overlapped them.
+        """
+        for _ in range(self.LOAD_ATTEMPTS):
+            writes = self.writes
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(select(can_access.c.id, can_access.c.id_1))).all()
+                catalogs = (await db.execute(
+                    select(Catalog.id, Catalog.name, Catalog.address, Catalog.private_key)
+                )).all()
+            up_to_date = self.writes == writes
+            if up_to_date:
+                break
+
+        user_catalogs: Dict[int, set] = {}
+        for user_id, catalog_id in rows:
+            user_catalogs.setdefault(user_id, set()).add(catalog_id)
+
+        # Swap complete structures so lookups never see a half loaded index
+        self.user_catalogs = {user_id: frozenset(ids) for user_id, ids in user_catalogs.items()}
+        self.catalogs = {catalog.id: CatalogTarget.model_validate(catalog) for catalog in catalogs}
+        self.reloads += 1
+        if up_to_date:
+            self.loaded_at = time.monotonic()
+        else:
+            # Still racing with writers, serve this snapshot only until the next lookup reloads
+            logger.warning("Access index reload kept overlapping writes, reloading on next lookup")
+            self.loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl
+
+    async def _ensure_fresh(self):
+        if not self._is_stale():
+            return
+        # Requests arriving during a reload wait for it instead of starting their own
+        async with self._load_lock:
+            if self._is_stale():
+                await self.load()
+
+    async def catalog(self, catalog_id: int) -> Optional[CatalogTarget]:
+        await self._ensure_fresh()
+        return self.catalogs.get(catalog_id)
+
+    async def all_catalogs(self) -> List[CatalogTarget]:
+        await self._ensure_fresh()
+        return list(self.catalogs.values())
+
+    async def catalog_ids(self, user_id: int) -> FrozenSet[int]:
+        """Get the ids of the catalogs a user can access"""
+        await self._ensure_fresh()
+        return self.user_catalogs.get(user_id, frozenset())
+
+    async def can_access(self, user_id: int, catalog_id: int) -> bool:
+        return catalog_id in await self.catalog_ids(user_id)
+
+    def put_catalog(self, catalog: Any):
+        """Add or replace a created or updated catalog"""
+        self.writes += 1
+        if self.loaded_at is not None:
+            self.catalogs[catalog.id] = CatalogTarget.model_validate(catalog)
+
+    def remove_catalog(self, catalog_id: int):
+        self.writes += 1
+        if self.loaded_at is None:
+            return
+        self.catalogs.pop(catalog_id, None)
+        self.user_catalogs = {
+            user_id: catalog_ids - {catalog_id} for user_id, catalog_ids in self.user_catalogs.items()
+        }
+
+    def set_user_catalogs(self, user_id: int, catalog_ids: Iterable[int]):
+        """Replace the catalogs a user can access"""
+        self.writes += 1
+        if self.loaded_at is not None:
+            self.user_catalogs[user_id] = frozenset(catalog_ids)
+
+    def set_catalog_users(self, catalog_id: int, user_ids: Iterable[int]):
+        """Replace the users who can access a catalog"""
+        self.writes += 1
+        if self.loaded_at is None:
+            return
+        user_ids = set(user_ids)
+        for user_id in user_ids | set(self.user_catalogs):
+            catalog_ids = self.user_catalogs.get(user_id, frozenset())
+            if user_id in user_ids:
+                self.user_catalogs[user_id] = catalog_ids | {catalog_id}
+            elif catalog_id in catalog_ids:
+                self.user_catalogs[user_id] = catalog_ids - {catalog_id}
+
+    def remove_user(self, user_id: int):
+        self.writes += 1
+        self.user_catalogs.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.user_catalogs),
+            "catalogs": len(self.catalogs),
+            "reloads": self.reloads
+        }
+
+
+# Create a singleton instance
+access_index = AccessIndex(settings.ACCESS_INDEX_TTL)
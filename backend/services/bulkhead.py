@@ -0,0 +1,133 @@
+from config import settings
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Tuple
+
+from services.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadFull(Exception):
+    """Raised when the waiting queue of a bulkhead is full"""
+
+
+class BulkheadTimeout(Exception):
+    """Raised when a call waited too long in the queue of a bulkhead"""
+
+
+class Bulkhead:
+    """Limits concurrent calls, queueing the extra ones in FIFO order"""
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_time = Histogram()
+
+    async def acquire(self):
+        """
+        Take a slot, waiting in the queue when all of them are busy
+
+        Raises:
+            BulkheadFull: The queue already holds max_queue calls
+            BulkheadTimeout: No slot freed up within timeout seconds
+        """
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.wait_time.observe(0.0)
+            return
+
+        if len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFull()
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.waiters.remove(waiter)
+                self.timeouts += 1
+                raise BulkheadTimeout()
+            # The slot was handed over right as the timeout fired, keep it
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was already handed over to us, pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self.waiters.remove(waiter)
+            raise
+        self.wait_time.observe(time.perf_counter() - started)
+
+    def release(self):
+        """Free a slot, handing it directly to the oldest waiting call"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_time": self.wait_time.snapshot()
+        }
+
+
+class BulkheadRegistry:
+    """Keeps separate read and write bulkheads per catalog address"""
+
+    def __init__(self):
+        self.bulkheads: Dict[Tuple[str, str], Bulkhead] = {}
+
+    def get(self, address: str, write: bool) -> Bulkhead:
+        """Get the read or write bulkhead of a catalog address"""
+        kind = "write" if write else "read"
+        bulkhead = self.bulkheads.get((address, kind))
+        if bulkhead is None:
+            bulkhead = Bulkhead(
+                limit=settings.PROXY_MAX_CONCURRENT_WRITES if write else settings.PROXY_MAX_CONCURRENT_READS,
+                max_queue=settings.PROXY_QUEUE_SIZE,
+                timeout=settings.PROXY_QUEUE_TIMEOUT
+            )
+            self.bulkheads[(address, kind)] = bulkhead
+        return bulkhead
+
+    def discard(self, address: str):
+        """Forget the bulkheads of a catalog whose address changed or was removed"""
+        self.bulkheads.pop((address, "read"), None)
+        self.bulkheads.pop((address, "write"), None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the stats of every bulkhead keyed by address and kind"""
+        return {f"{address} ({kind})": bulkhead.stats() for (address, kind), bulkhead in self.bulkheads.items()}
+
+
+# Create a singleton instance
+catalog_bulkheads = BulkheadRegistry()
@@ -0,0 +1,117 @@
+from config import settings
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogResponseCache:
+    """Size-bounded LRU cache with a TTL for catalog read responses"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        # Bumped on every invalidation so reads started before a write are not cached
+        self.generations: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(catalog_id: int, path: str, params: Optional[dict] = None) -> Tuple:
+        """Build the cache key for a catalog read"""
+        return (catalog_id, path, tuple(sorted((params or {}).items())))
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Key built by make_key
+
+        Returns:
+            The cached entry, or None on a miss or when the entry expired
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry["expires_at"] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def generation(self, catalog_id: int) -> int:
+        """Return the invalidation generation of a catalog"""
+        return self.generations.get(catalog_id, 0)
+
+    def set(
+        self,
+        key: Tuple,
+        content: bytes,
+        status_code: int,
+        media_type: str,
+        headers: Optional[Dict[str, str]] = None,
+        generation: Optional[int] = None
+    ):
+        """
+        Store a response, evicting the least recently used entries past max_entries
+
+        Args:
+            key: Key built by make_key
+            content: Response body
+            status_code: Response status code
+            media_type: Response content type
+            headers: Validator headers (ETag, Last-Modified, Cache-Control) of the response
+            generation: Catalog generation read before fetching, the response is dropped if it changed since
+        """
+        if generation is not None and generation != self.generation(key[0]):
+            return
+
+        self.entries[key] = {
+            "content": content,
+            "status_code": status_code,
+            "media_type": media_type,
+            "headers": headers or {},
+            "expires_at": time.monotonic() + self.ttl
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, catalog_id: int):
+        """Drop every cached response of a catalog"""
+        self.generations[catalog_id] = self.generation(catalog_id) + 1
+        stale = [key for key in self.entries if key[0] == catalog_id]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self.invalidations += 1
+            logger.debug(f"Invalidated {len(stale)} cached responses for catalog {catalog_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+# Create a singleton instance
+catalog_cache = CatalogResponseCache(settings.PROXY_CACHE_TTL, settings.PROXY_CACHE_MAX_ENTRIES)
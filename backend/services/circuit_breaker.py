@@ -0,0 +1,138 @@
+from config import settings
+import logging
+import time
+from collections import deque
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Tracks the recent outcomes of calls to one catalog service"""
+
+    def __init__(self, failure_rate: float, min_calls: int, window: int, open_seconds: float):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.outcomes = deque(maxlen=window)  # True for a failed call
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def current_state(self) -> str:
+        """Return the state, moving from open to half-open once the cool-down elapsed"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        return self.state
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may go through
+
+        Returns:
+            True when closed, or for the single probe call allowed while half-open
+        """
+        state = self.current_state()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker lets a probe call through"""
+        remaining = self.open_seconds - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def record_success(self):
+        """Record a call that reached the service"""
+        if self.state == HALF_OPEN:
+            self._close()
+        self.outcomes.append(False)
+
+    def record_failure(self, timeout: bool = False):
+        """Record a call that failed because of the service (connection error, timeout or 5xx)"""
+        self.failures += 1
+        if timeout:
+            self.timeouts += 1
+
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+
+        self.outcomes.append(True)
+        if len(self.outcomes) >= self.min_calls and sum(self.outcomes) / len(self.outcomes) >= self.failure_rate:
+            self._open()
+
+    def release(self):
+        """Give back a half-open probe slot for a call that said nothing about the service health"""
+        self.probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def _close(self):
+        self.state = CLOSED
+        self.outcomes.clear()
+        self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the state and counters of the breaker"""
+        return {
+            "state": self.current_state(),
+            "recent_calls": len(self.outcomes),
+            "recent_failures": sum(self.outcomes),
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected
+        }
+
+
+class CircuitBreakerRegistry:
+    """Keeps one circuit breaker per catalog address"""
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, address: str) -> CircuitBreaker:
+        """Get the breaker of a catalog address, creating it closed"""
+        breaker = self.breakers.get(address)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_rate=settings.PROXY_BREAKER_FAILURE_RATE,
+                min_calls=settings.PROXY_BREAKER_MIN_CALLS,
+                window=settings.PROXY_BREAKER_WINDOW,
+                open_seconds=settings.PROXY_BREAKER_OPEN_SECONDS
+            )
+            self.breakers[address] = breaker
+        return breaker
+
+    def state(self, address: str) -> str:
+        """Get the state of a catalog address without creating a breaker"""
+        breaker = self.breakers.get(address)
+        return breaker.current_state() if breaker else CLOSED
+
+    def discard(self, address: str):
+        """Forget the breaker of a catalog whose address changed or was removed"""
+        self.breakers.pop(address, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the stats of every breaker keyed by address"""
+        return {address: breaker.stats() for address, breaker in self.breakers.items()}
+
+
+# Create a singleton instance
+catalog_breakers = CircuitBreakerRegistry()
@@ -6,12 +6,14 @@ import socket
 import psutil
 import platform
 import uuid
+from urllib.parse import urlsplit
 from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 import json
 import requests
 
-from database import DiscoveredService, SessionLocal
+from database import DiscoveredService, ServicePort, SessionLocal
+from sqlalchemy.orm import selectinload
 
 logger = logging.getLogger(__name__)
 
@@ -286,7 +288,11 @@ class EnvServiceDiscovery:
         # Generate a consistent service_id based on the URL
         service_id = f"url-{str(uuid.uuid5(uuid.NAMESPACE_URL, base_url))}"
                 
-        port = base_url.split(':')[-1] if ':' in base_url else None
+        # Stored in Integer columns, "http://localhost:5002/api" gives 5002
+        try:
+            port = urlsplit(base_url if '//' in base_url else f"//{base_url}").port
+        except ValueError:
+            port = None
         # http://localhost:5002 remove the port
         host = base_url.split('/')[2].split(':')[0] if '//' in base_url else base_url.split('/')[0]
         
@@ -400,7 +406,7 @@ class UnifiedServiceDiscovery:
             # Get existing services by service_id
             existing_services = {
                 service.service_id: service 
-                for service in db.query(DiscoveredService).all()
+                for service in db.query(DiscoveredService).options(selectinload(DiscoveredService.ports)).all()
             }
             
             updated_services = []
@@ -440,6 +446,7 @@ class UnifiedServiceDiscovery:
                     service.additional_ports = service_info.get('additional_ports')
                     service.details = service_info.get('details')
                     service.updated_at = datetime.utcnow()
+                    self._sync_ports(service, service_info)
                 else:
                     # Create new service
                     service = DiscoveredService(
@@ -452,6 +459,7 @@ class UnifiedServiceDiscovery:
                         additional_ports=service_info.get('additional_ports'),
                         details=service_info.get('details')
                     )
+                    self._sync_ports(service, service_info)
                     db.add(service)
                 
                 updated_services.append(service)
@@ -471,6 +479,19 @@ class UnifiedServiceDiscovery:
             return []
         finally:
             db.close()
+    
+    def _sync_ports(self, service: DiscoveredService, service_info: Dict[str, Any]):
+        """Keep the indexed port rows of a service in line with its main and additional ports"""
+        # Compared with the integers read back from the table, so "5000" must not differ from 5000
+        ports = {int(port) for port in service_info.get('additional_ports') or [] if port is not None}
+        if service_info.get('port') is not None:
+            ports.add(int(service_info['port']))
+        
+        current = {service_port.port for service_port in service.ports}
+        if current == ports:
+            return
+        service.ports = [service_port for service_port in service.ports if service_port.port in ports]
+        service.ports.extend(ServicePort(port=port) for port in ports - current)
 
 
 # Create a singleton instance
@@ -0,0 +1,101 @@
+from config import settings
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal, User
+
+logger = logging.getLogger(__name__)
+
+
+class LastSeenRecorder:
+    """Records when users were last seen in memory and writes them to the database in batches"""
+
+    def __init__(self, granularity: float):
+        self.granularity = granularity
+        self.pending: Dict[int, datetime] = {}  # user id -> last seen, not written yet
+        self.recorded: Dict[int, float] = {}  # user id -> monotonic time of the last recorded visit
+        self.flushes = 0
+        self.written = 0
+        self.skipped = 0
+
+    def touch(self, user_id: int):
+        """Record a visit of a user, ignoring visits closer than granularity seconds to the previous one"""
+        now = time.monotonic()
+        recorded = self.recorded.get(user_id)
+        if recorded is not None and now - recorded < self.granularity:
+            self.skipped += 1
+            return
+        self.recorded[user_id] = now
+        self.pending[user_id] = datetime.now()
+
+    def forget(self, user_id: int):
+        """Drop the pending visit of a deleted user"""
+        self.pending.pop(user_id, None)
+        self.recorded.pop(user_id, None)
+
+    def flush(self) -> int:
+        """
+        Write every pending visit with one executemany UPDATE
+
+        Visits of users deleted meanwhile (possibly by another worker) match no row and are dropped.
+        Visits are kept for the next flush only when the database was unavailable (locked, gone).
+
+        Returns:
+            Number of users updated
+        """
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+
+        # Core UPDATE, unlike the ORM bulk update by primary key it does not fail on missing rows
+        users = User.__table__
+        statement = update(users).where(users.c.id == bindparam("uid")).values(last_connected=bindparam("seen"))
+
+        db = SessionLocal()
+        try:
+            result = db.execute(statement, [{"uid": user_id, "seen": seen} for user_id, seen in pending.items()])
+            db.commit()
+        except OperationalError:
+            db.rollback()
+            # Keep the visits for the next flush unless newer ones were recorded meanwhile
+            for user_id, seen in pending.items():
+                self.pending.setdefault(user_id, seen)
+            raise
+        except Exception:
+            # Retrying would fail the same way and block every later flush, drop this batch
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        updated = result.rowcount if result.rowcount >= 0 else len(pending)
+        self.flushes += 1
+        self.written += updated
+        return updated
+
+    async def run(self, interval: float):
+        """Flush pending visits every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Error flushing last connected times: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "skipped": self.skipped
+        }
+
+
+# Create a singleton instance
+last_seen = LastSeenRecorder(settings.LAST_SEEN_GRANULARITY)
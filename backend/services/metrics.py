@@ -0,0 +1,157 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, the last one catches everything up to the proxy timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Timings recorded for every upstream call
+TIMINGS = ("connect", "ttfb", "total")
+
+
+def status_class(status_code: Optional[int]) -> str:
+    """Map a status code to its class ("2xx", "4xx"...), or "error" when no response was received"""
+    if status_code is None:
+        return "error"
+    return f"{status_code // 100}xx"
+
+
+class UpstreamTrace:
+    """httpx trace hook measuring connection setup and time to first byte of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.connected: Optional[float] = None
+        self.headers_received: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]):
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connected = now
+        elif event_name.endswith(".receive_response_headers.complete"):
+            self.headers_received = now
+
+    @property
+    def connect(self) -> Optional[float]:
+        """Seconds spent opening a new connection, None when a pooled connection was reused"""
+        if self.connect_started is None or self.connected is None:
+            return None
+        return self.connected - self.connect_started
+
+    @property
+    def ttfb(self) -> Optional[float]:
+        """Seconds until the response headers were received"""
+        if self.headers_received is None:
+            return None
+        return self.headers_received - self.started
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record one duration in seconds"""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, cumulative count) pairs, ending with +Inf"""
+        pairs = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            pairs.append(("+Inf" if bound == float("inf") else str(bound), running))
+        return pairs
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative())
+        }
+
+
+class UpstreamMetrics:
+    """Latency histograms of upstream calls labeled by catalog id, path and status class"""
+
+    def __init__(self):
+        self.series: Dict[Tuple[int, str, str], Dict[str, Histogram]] = {}
+
+    def observe(
+        self,
+        catalog_id: int,
+        path: str,
+        status: str,
+        connect: Optional[float] = None,
+        ttfb: Optional[float] = None,
+        total: Optional[float] = None
+    ):
+        """
+        Record the timings of an upstream call
+
+        Args:
+            catalog_id: Catalog the call was made to
+            path: Upstream path, without query parameters
+            status: Status class from status_class()
+            connect: Time spent opening a new connection, None when a pooled one was reused
+            ttfb: Time until the response headers were received
+            total: Time until the response body was fully read
+        """
+        histograms = self.series.get((catalog_id, path, status))
+        if histograms is None:
+            histograms = {timing: Histogram() for timing in TIMINGS}
+            self.series[(catalog_id, path, status)] = histograms
+
+        for timing, value in zip(TIMINGS, (connect, ttfb, total)):
+            if value is not None:
+                histograms[timing].observe(value)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return every series as a JSON-friendly list"""
+        return [
+            {
+                "catalog_id": catalog_id,
+                "path": path,
+                "status_class": status,
+                **{timing: histogram.snapshot() for timing, histogram in histograms.items()}
+            }
+            for (catalog_id, path, status), histograms in sorted(self.series.items())
+        ]
+
+    def render_prometheus(self) -> str:
+        """Render every series in the Prometheus text exposition format"""
+        lines = []
+        for timing in TIMINGS:
+            name = f"beehub_upstream_{timing}_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for (catalog_id, path, status), histograms in sorted(self.series.items()):
+                histogram = histograms[timing]
+                labels = f'catalog_id="{catalog_id}",path="{path}",status_class="{status}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Create a singleton instance
+upstream_metrics = UpstreamMetrics()
@@ -0,0 +1,65 @@
+from config import settings
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class FullScanDetector:
+    """Runs EXPLAIN QUERY PLAN on each distinct SELECT (SQLite only) and reports full table scans"""
+
+    def __init__(self):
+        self.checked = set()
+        self.full_scans: Dict[str, List[str]] = {}  # statement -> plan steps scanning a whole table
+
+    def install(self, engine):
+        if engine.dialect.name != "sqlite":
+            logger.warning("Full table scan detection is only supported on SQLite")
+            return
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if executemany or statement in self.checked or not statement.lstrip().upper().startswith("SELECT"):
+            return
+        self.checked.add(statement)
+
+        # A second DBAPI cursor on the same connection, works with pysqlite and aiosqlite alike
+        explain = connection.connection.cursor()
+        try:
+            explain.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = explain.fetchall()
+        except Exception as e:
+            logger.debug(f"Could not explain query: {e}")
+            return
+        finally:
+            explain.close()
+
+        # "SCAN users" reads every row, "SCAN users USING INDEX ..." and "SEARCH ..." do not
+        scans = [step[-1] for step in plan if self.is_full_scan(step[-1])]
+        if scans:
+            self.full_scans[statement] = scans
+            logger.warning(f"Full table scan ({'; '.join(scans)}) in query: {' '.join(statement.split())}")
+
+    @staticmethod
+    def is_full_scan(detail: str) -> bool:
+        if not detail.startswith("SCAN ") or " USING " in detail:
+            return False
+        # SQLite's own catalog, constant rows and subqueries already explained on their own
+        target = detail[len("SCAN "):]
+        return not target.startswith(("sqlite_", "CONSTANT ROW", "(subquery", "TABLE sqlite_"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.DATABASE_EXPLAIN_QUERIES,
+            "checked_queries": len(self.checked),
+            "full_scans": [
+                {"query": " ".join(statement.split()), "plan": scans}
+                for statement, scans in self.full_scans.items()
+            ]
+        }
+
+
+# Create a singleton instance
+query_plans = FullScanDetector()
@@ -0,0 +1,144 @@
+from config import settings
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Keeps the most recent latencies of each kind of read to derive percentiles"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self.samples: Dict[Hashable, Deque[float]] = {}
+
+    def record(self, key: Hashable, seconds: float):
+        samples = self.samples.get(key)
+        if samples is None:
+            samples = deque(maxlen=self.window)
+            self.samples[key] = samples
+        samples.append(seconds)
+
+    def percentile(self, key: Hashable, percent: float, min_samples: int) -> Optional[float]:
+        """
+        Get a latency percentile
+
+        Args:
+            key: Kind of read
+            percent: Percentile between 0 and 100
+            min_samples: Minimum number of samples needed for a meaningful value
+
+        Returns:
+            The percentile in seconds, or None when there are not enough samples yet
+        """
+        samples = self.samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+class ReadPolicy:
+    """Opt-in hedging and retries for idempotent upstream reads"""
+
+    def __init__(self):
+        self.latencies = LatencyTracker()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.retries = 0
+
+    def hedge_delay(self, key: Hashable) -> Optional[float]:
+        """Delay after which a hedge request is sent, None when hedging is off or not calibrated"""
+        if not settings.PROXY_HEDGE_READS:
+            return None
+        delay = self.latencies.percentile(key, settings.PROXY_HEDGE_PERCENTILE, settings.PROXY_HEDGE_MIN_SAMPLES)
+        if delay is None:
+            return None
+        return max(delay, settings.PROXY_HEDGE_MIN_DELAY)
+
+    async def run(
+        self,
+        key: Hashable,
+        attempt: Callable[[], Awaitable[Any]],
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        is_success: Callable[[Any], bool] = lambda result: True
+    ) -> Any:
+        """
+        Run an idempotent read with hedging and retries
+
+        Args:
+            key: Kind of read, used to track its latency percentile
+            attempt: Coroutine function performing one upstream call
+            retry_on: Exceptions (connection errors) that trigger a retry with jittered backoff
+            is_success: Tells whether a result should win over a still running hedge
+
+        Returns:
+            The result of the first successful attempt
+        """
+        retries = settings.PROXY_READ_RETRIES
+        for retry in range(retries + 1):
+            try:
+                return await self._hedged(key, attempt, is_success)
+            except retry_on:
+                if retry == retries:
+                    raise
+                self.retries += 1
+                # Full jitter exponential backoff
+                await asyncio.sleep(random.uniform(0, settings.PROXY_RETRY_BACKOFF * 2 ** retry))
+
+    async def _hedged(self, key: Hashable, attempt: Callable[[], Awaitable[Any]], is_success: Callable[[Any], bool]) -> Any:
+        async def timed_attempt():
+            started = time.perf_counter()
+            result = await attempt()
+            self.latencies.record(key, time.perf_counter() - started)
+            return result
+
+        delay = self.hedge_delay(key)
+        first = asyncio.ensure_future(timed_attempt())
+        if delay is None:
+            return await first
+
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            self.hedges_sent += 1
+            hedge = asyncio.ensure_future(timed_attempt())
+            pending.add(hedge)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Retrieve every outcome first, the attempt not returned must not log "exception never retrieved"
+                outcomes = [(task, task.exception()) for task in done]
+                for task, error in outcomes:
+                    last = task
+                    if error is None and is_success(task.result()):
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+            # Neither attempt succeeded, report the outcome of the last one
+            return last.result()
+        finally:
+            # Also reached when the caller is cancelled, no attempt may keep its bulkhead slot and connection
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedging_enabled": settings.PROXY_HEDGE_READS,
+            "max_retries": settings.PROXY_READ_RETRIES,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "retries": self.retries
+        }
+
+
+# Create a singleton instance
+read_policy = ReadPolicy()
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Registry of in-flight calls so concurrent identical calls share one execution"""
+
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn once for all concurrent callers using the same key
+
+        Args:
+            key: Identity of the call
+            fn: Coroutine function performing the call
+
+        Returns:
+            The result of the shared call (its exception is raised to every caller)
+        """
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        # Shield the shared task so one caller disconnecting does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        """Remove a finished call from the registry"""
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls were executed and how many were coalesced onto them"""
+        return {
+            "in_flight": len(self.in_flight),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
+
+
+# Create a singleton instance for catalog reads
+catalog_reads = SingleFlight()
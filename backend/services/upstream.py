@@ -0,0 +1,85 @@
+from config import settings
+import logging
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamClientPool:
+    """Keeps one long-lived httpx client per catalog address"""
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.shared_client: Optional[httpx.AsyncClient] = None
+
+    def _http2_enabled(self) -> bool:
+        """Check whether HTTP/2 is requested and the optional h2 package is available"""
+        if not settings.PROXY_HTTP2:
+            return False
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("PROXY_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+            return False
+        return True
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create a client configured with the proxy pool limits"""
+        limits = httpx.Limits(
+            max_connections=settings.PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.PROXY_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.PROXY_KEEPALIVE_EXPIRY
+        )
+        return httpx.AsyncClient(
+            timeout=settings.PROXY_TIMEOUT,
+            limits=limits,
+            http2=self._http2_enabled()
+        )
+
+    def get_client(self, address: Optional[str] = None) -> httpx.AsyncClient:
+        """
+        Get the pooled client for a catalog address
+
+        Args:
+            address: Catalog base address, if None the shared client for ad-hoc hosts is returned
+
+        Returns:
+            A long-lived httpx.AsyncClient
+        """
+        if address is None:
+            if self.shared_client is None:
+                self.shared_client = self._create_client()
+            return self.shared_client
+
+        client = self.clients.get(address)
+        if client is None:
+            client = self._create_client()
+            self.clients[address] = client
+            logger.info(f"Created upstream client for {address}")
+        return client
+
+    async def discard(self, address: str):
+        """Close and forget the client of a catalog whose address changed or was removed"""
+        client = self.clients.pop(address, None)
+        if client is not None:
+            await client.aclose()
+
+    async def close(self):
+        """Close every pooled client"""
+        clients = list(self.clients.values())
+        if self.shared_client is not None:
+            clients.append(self.shared_client)
+        self.clients = {}
+        self.shared_client = None
+
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing upstream client: {e}")
+
+
+# Create a singleton instance
+upstream_pool = UpstreamClientPool()
@@ -1,14 +1,18 @@
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
 from utils.password import verify_password
-# Import database components in a way that avoids circular imports
-from database import SessionLocal
+from database import get_db
+from services.last_seen import last_seen
 
 # Use HTTPBearer instead of OAuth2PasswordBearer for JSON-only authentication
 security = HTTPBearer()
@@ -18,6 +22,73 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+class Principal(BaseModel):
+    """Lightweight view of the authenticated user, cached between requests."""
+    id: int
+    username: str
+    is_owner: bool
+
+
+class PrincipalCache:
+    """Size-bounded LRU cache with a TTL from token subject (username) to principal"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self.usernames: Dict[int, str] = {}  # user id -> cached username, for invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[Principal]:
+        entry = self.entries.get(username)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                self._remove(username)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(username)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, principal: Principal):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self.entries[principal.username] = (principal, time.monotonic() + self.ttl)
+        self.entries.move_to_end(principal.username)
+        self.usernames[principal.id] = principal.username
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, user_id: int):
+        """Drop the cached principal of a user whose account changed"""
+        username = self.usernames.get(user_id)
+        if username is not None:
+            self._remove(username)
+
+    def clear(self):
+        self.entries.clear()
+        self.usernames.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _remove(self, username: str):
+        principal, _ = self.entries.pop(username)
+        if self.usernames.get(principal.id) == username:
+            del self.usernames[principal.id]
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_TTL, settings.AUTH_CACHE_MAX_ENTRIES)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token."""
     to_encode = data.copy()
@@ -27,8 +98,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(lambda: next(get_db()))):
-    """Get current user from JWT token."""
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)):
+    """
+    Get current user from JWT token.
+
+    The session is the request's own get_db session, FastAPI shares it with the route handler.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,16 +120,27 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
 
-    from database import User
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
+    principal = principal_cache.get(token_data.username)
+    if principal is None:
+        principal = await load_principal(db, token_data.username)
+        if principal is None:
+            raise credentials_exception
+        principal_cache.set(principal)
 
-    # Update last connected time
-    user.last_connected = datetime.now()
-    db.commit()
+    # Update last connected time, written to the database in batches
+    last_seen.touch(principal.id)
 
-    return user
+    return principal
+
+
+async def load_principal(db: AsyncSession, username: str) -> Optional[Principal]:
+    """Load the principal of a user from the database."""
+    from database import User
+    result = await db.execute(select(User.id, User.username, User.is_owner).where(User.username == username))
+    user = result.first()
+    if user is None:
+        return None
+    return Principal(id=user.id, username=user.username, is_owner=user.is_owner)
 
 
 def get_owner_user(current_user=Depends(get_current_user)):
@@ -65,13 +151,3 @@ def get_owner_user(current_user=Depends(get_current_user)):
             detail="Not enough permissions"
         )
     return current_user
-
-
-# Add local get_db function to avoid circular import
-def get_db():
-    """Get database session."""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
@@ -1,5 +1,12 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from config import settings
+from services.bulkhead import Bulkhead, BulkheadFull, BulkheadTimeout
+
 # Password encryption context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -12,3 +19,49 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     """Hash a password using bcrypt."""
     return pwd_context.hash(password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated thread pool so hashing never blocks the event loop"""
+
+    def __init__(self, workers: int, max_queue: int, timeout: float):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Bounds the calls waiting for a worker, the extra ones are refused instead of piling up
+        self.bulkhead = Bulkhead(limit=workers, max_queue=max_queue, timeout=timeout)
+
+    async def run(self, fn, *args):
+        """
+        Run a bcrypt call on the hashing pool
+
+        Raises:
+            HTTPException: 503 when the queue is full or the call waited too long for a worker
+        """
+        try:
+            async with self.bulkhead.slot():
+                return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        except (BulkheadFull, BulkheadTimeout):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password checks in progress, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(get_password_hash, password)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return self.bulkhead.stats()
+
+
+# Create a singleton instance
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT
+)
@@ -0,0 +1,157 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from config import settings
+from utils.auth import get_current_user
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def parse_limit(limit: str) -> Tuple[float, float]:
+    """
+    Parse a limit such as "300/minute"
+
+    Returns:
+        (refill rate in tokens per second, bucket capacity)
+    """
+    count, _, period = limit.partition("/")
+    capacity = float(count)
+    return capacity / PERIODS[period.strip() or "second"], capacity
+
+
+class InMemoryRateLimitStore:
+    """Token buckets kept in process, ordered by last use so idle ones are evicted first"""
+
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, updated]
+
+    async def take(self, key: str, rate: float, capacity: float) -> Tuple[bool, float]:
+        """
+        Take one token from a bucket
+
+        Returns:
+            (whether the call is allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        bucket = self.buckets.pop(key, None)
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = [tokens, now]
+
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def _evict_idle(self, now: float):
+        # Buckets are ordered by last use, so only the oldest ones need checking
+        while self.buckets:
+            key, (_, updated) = next(iter(self.buckets.items()))
+            if now - updated < self.idle_seconds:
+                break
+            self.buckets.popitem(last=False)
+
+
+# Token bucket evaluated atomically inside Redis so every worker shares the same buckets
+REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + (now - tonumber(bucket[2])) * rate)
+end
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitStore:
+    """Token buckets shared between workers through Redis (requires the optional 'redis' package)"""
+
+    def __init__(self, url: str, idle_seconds: float):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL points to Redis but the 'redis' package is not installed")
+        self.idle_seconds = idle_seconds
+        self.client = aioredis.from_url(url)
+        self.script = self.client.register_script(REDIS_TOKEN_BUCKET)
+
+    async def take(self, key: str, rate: float, capacity: float) -> Tuple[bool, float]:
+        allowed, tokens = await self.script(
+            keys=[f"beehub:ratelimit:{key}"],
+            args=[rate, capacity, int(self.idle_seconds)]
+        )
+        tokens = float(tokens)
+        return bool(allowed), 0.0 if allowed else (1 - tokens) / rate
+
+
+def create_store(url: str):
+    """Create the rate limit store selected by RATE_LIMIT_STORAGE_URL"""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisRateLimitStore(url, settings.RATE_LIMIT_IDLE_SECONDS)
+    if url != "memory://":
+        raise ValueError(f"Unsupported RATE_LIMIT_STORAGE_URL: {url}")
+    return InMemoryRateLimitStore(settings.RATE_LIMIT_IDLE_SECONDS)
+
+
+class RateLimiter:
+    """Per-user token bucket rate limiting by route group"""
+
+    def __init__(self, store, limits: Dict[str, str]):
+        self.store = store
+        self.limits = {group: parse_limit(limit) for group, limit in limits.items()}
+        self.rejected = 0
+
+    async def check(self, user_id: int, group: str):
+        """Take a token for a user in a route group, raising 429 with Retry-After when the bucket is empty"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        rate, capacity = self.limits[group]
+        allowed, retry_after = await self.store.take(f"{group}:{user_id}", rate, capacity)
+        if not allowed:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, slow down",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+
+# Create a singleton instance
+rate_limiter = RateLimiter(
+    create_store(settings.RATE_LIMIT_STORAGE_URL),
+    {
+        "proxy": settings.RATE_LIMIT_PROXY,
+        "api": settings.RATE_LIMIT_API,
+        "discovery": settings.RATE_LIMIT_DISCOVERY
+    }
+)
+
+
+def rate_limit(group: str):
+    """Build a dependency limiting the authenticated user's calls in a route group."""
+    async def dependency(current_user=Depends(get_current_user)):
+        await rate_limiter.check(current_user.id, group)
+    return dependency
@@ -59,13 +59,13 @@ const TeamPage = () => {
     const loadData = async () => {
       try {
         setLoading(true);
-        const [usersData, catalogsData, isOwner] = await Promise.all([
-          getUsers(),
+        const [catalogsData, isOwner] = await Promise.all([
           getCatalogs(),
           fetchIsOwner(username),
         ]);
 
-        setUsers(usersData);
+        // Only owners may list users
+        setUsers(isOwner ? await getUsers() : []);
         setCatalogs(catalogsData);
         setIsOwner(isOwner);
       } catch (error) {
@@ -1,21 +1,9 @@
 import { Catalog } from "../types/Catalog";
 import { Theme } from "../types/Theme";
+import { fetchAllPages } from "./pagination";
 
 export const getCatalogs = async (): Promise<Catalog[]> => {
-  const response = await fetch("/api/catalogs/", {
-    method: "GET",
-    headers: {
-      "Content-Type": "application/json",
-      Authorization: `Bearer ${localStorage.getItem("token")}`,
-    },
-  });
-
-  if (!response.ok) {
-    throw new Error("Failed to fetch catalogs");
-  }
-  const data = await response.json();
-
-  return data as Catalog[];
+  return fetchAllPages<Catalog>("/api/catalogs/", "Failed to fetch catalogs");
 };
 
 export interface CreateCatalogDto {
@@ -0,0 +1,31 @@
+// List endpoints return one page at a time, the cursor of the next page
+// comes in the X-Next-Cursor header and is absent on the last page.
+export const fetchAllPages = async <T>(
+  url: string,
+  errorMessage: string
+): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const pageUrl: string = cursor
+      ? `${url}?cursor=${encodeURIComponent(cursor)}`
+      : url;
+    const response: Response = await fetch(pageUrl, {
+      method: "GET",
+      headers: {
+        "Content-Type": "application/json",
+        Authorization: `Bearer ${localStorage.getItem("token")}`,
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(errorMessage);
+    }
+
+    items.push(...((await response.json()) as T[]));
+    cursor = response.headers.get("X-Next-Cursor");
+  } while (cursor);
+
+  return items;
+};
@@ -1,18 +1,6 @@
 import { Service } from "../types/Service";
+import { fetchAllPages } from "./pagination";
 
 export const getServices = async (): Promise<Service[]> => {
-  const response = await fetch("/api/services/", {
-    method: "GET",
-    headers: {
-      "Content-Type": "application/json",
-      Authorization: `Bearer ${localStorage.getItem("token")}`,
-    },
-  });
-
-  if (!response.ok) {
-    throw new Error("Failed to fetch services");
-  }
-
-  const data = await response.json();
-  return data as Service[];
+  return fetchAllPages<Service>("/api/services/", "Failed to fetch services");
 };
@@ -1,3 +1,5 @@
+import { fetchAllPages } from "./pagination";
+
 export interface User {
   id: number;
   username: string;
@@ -17,20 +19,7 @@ export interface UpdateUserDto {
 }
 
 export const getUsers = async (): Promise<User[]> => {
-  const response = await fetch("/api/users/", {
-    method: "GET",
-    headers: {
-      "Content-Type": "application/json",
-      Authorization: `Bearer ${localStorage.getItem("token")}`,
-    },
-  });
-
-  if (!response.ok) {
-    throw new Error("Failed to fetch users");
-  }
-
-  const data = await response.json();
-  return data as User[];
+  return fetchAllPages<User>("/api/users/", "Failed to fetch users");
 };
 
 export const getUserById = async (userId: number): Promise<User> => {
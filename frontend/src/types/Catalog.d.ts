@@ -4,4 +4,5 @@ export interface Catalog {
   name: string;
   description?: string;
   private_key: string;
+  circuit_state?: "closed" | "open" | "half_open";
 }